@@ -1,15 +1,22 @@
 from __future__ import annotations
-from dataclasses import dataclass, field, asdict
-from typing import Dict, Any
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 import json
 import logging
+import os
+import threading
+import time
+
+from .rules import RefundRule, RuleTable
 
 logger = logging.getLogger("FPC.AutoRefund.Config")
 
+CONFIG_PATH = Path("storage/plugins/auto_refund.json")
 
-@dataclass
-class RefundConfig:
+
+@dataclass(frozen=True)
+class RefundSettings:
     star_1: bool = False
     star_2: bool = False
     star_3: bool = False
@@ -21,47 +28,211 @@ class RefundConfig:
     feedback_delete: bool = False
     refund_notification_chat_id: int = 0
     blacklist_message: str = "Вы в черном списке магазина. ❌"
-    
-    _config_path: Path = field(default=Path("storage/plugins/auto_refund.json"), init=False)
+    ban_ttl_bad_review: float = 0.0
+    ban_ttl_feedback_deleted: float = 0.0
+    async_processing: bool = True
+    worker_count: int = 4
+    queue_size: int = 1000
+    queue_timeout: float = 5.0
+    feedback_debounce: float = 3.0
+    chat_cache_size: int = 10000
+    chat_cache_ttl: float = 86400.0
+    order_index_size: int = 50000
+    notification_rate: float = 0.3
+    notification_burst: int = 3
+    notification_digest_threshold: int = 5
+    notification_queue_size: int = 10000
+    notification_timeout: float = 10.0
+    notification_chat_ids: Tuple[int, ...] = ()
+    notification_webhooks: Tuple[Dict[str, Any], ...] = ()
+    metrics_export_interval: float = 60.0
+    trace_path: str = ""
+    audit_max_segments: int = 20
+    analytics_capacity: int = 100
+    analytics_spike_factor: float = 3.0
+    analytics_spike_min: int = 10
+    api_rate: float = 2.0
+    api_burst: int = 5
+    api_retries: int = 3
+    api_backoff_base: float = 1.0
+    api_backoff_max: float = 30.0
+    api_breaker_threshold: int = 5
+    api_breaker_cooldown: float = 60.0
+    outbox_interval: float = 60.0
+    outbox_batch_size: int = 50
+    outbox_rate: float = 1.0
+    outbox_max_attempts: int = 20
+    reconcile_on_startup: bool = False
+    reconcile_parallelism: int = 4
+    reconcile_max_orders: int = 2000
+    reconcile_lookback: float = 604800.0
+    shared_blacklist_path: str = ""
+    shared_blacklist_poll: float = 2.0
+    refund_rules: Tuple[Dict[str, Any], ...] = ()
+
+    star_mask: int = field(default=0, init=False, repr=False, compare=False)
+    rule_table: Optional[RuleTable] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        for name in ("notification_chat_ids", "notification_webhooks", "refund_rules"):
+            object.__setattr__(self, name, tuple(getattr(self, name)))
+        mask = 0
+        for stars in range(1, 6):
+            if getattr(self, f"star_{stars}"):
+                mask |= 1 << stars
+        object.__setattr__(self, "star_mask", mask)
+        object.__setattr__(self, "rule_table", RuleTable.compile(self.max_price, mask, self.refund_rules))
 
     @classmethod
-    def load(cls) -> RefundConfig:
-        config_path = Path("storage/plugins/auto_refund.json")
-        config_path.parent.mkdir(parents=True, exist_ok=True)
-        
+    def from_dict(cls, data: Dict[str, Any]) -> RefundSettings:
+        return cls(**{k: v for k, v in data.items() if k in _SETTING_FIELDS})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+    def should_refund_stars(self, stars: int) -> bool:
+        return 0 < stars < 6 and bool(self.star_mask >> stars & 1)
+
+    def rule_for(self, order: Any) -> RefundRule:
+        return self.rule_table.lookup(order)
+
+
+_SETTING_FIELDS = frozenset(f.name for f in fields(RefundSettings) if f.init)
+
+
+class RefundConfig:
+    SAVE_DELAY = 0.5
+    RELOAD_INTERVAL = 2.0
+
+    def __init__(self, settings: RefundSettings, config_path: Path = CONFIG_PATH):
+        self._snapshot = settings
+        self._version = 0
+        self._config_path = config_path
+        self._lock = threading.Lock()
+        self._dirty_since: Optional[float] = None
+        self._mtime = self._read_mtime()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run,
+            name="AutoRefund-Config",
+            daemon=True
+        )
+        self._worker.start()
+
+    @classmethod
+    def load(cls, config_path: Path = CONFIG_PATH) -> RefundConfig:
         if config_path.exists():
             try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    instance = cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
-                    instance._config_path = config_path
-                    logger.info("Configuration loaded")
-                    return instance
+                instance = cls(cls._read_settings(config_path), config_path)
+                logger.info("Configuration loaded")
+                return instance
             except Exception as e:
                 logger.error(f"Failed to load config: {e}")
-        
-        instance = cls()
-        instance._config_path = config_path
-        instance.save()
-        return instance
+
+        return cls(RefundSettings(), config_path)
+
+    @staticmethod
+    def _read_settings(config_path: Path) -> RefundSettings:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return RefundSettings.from_dict(json.load(f))
+
+    @property
+    def snapshot(self) -> RefundSettings:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _read_mtime(self) -> float:
+        try:
+            return self._config_path.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def _swap(self, settings: RefundSettings) -> None:
+        self._snapshot = settings
+        self._version += 1
+
+    def update(self, **kwargs: Any) -> None:
+        changes = {k: v for k, v in kwargs.items() if k in _SETTING_FIELDS}
+        if not changes:
+            return
+
+        with self._lock:
+            self._swap(replace(self._snapshot, **changes))
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+        self._wakeup.set()
 
     def save(self) -> None:
+        with self._lock:
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+        self._wakeup.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty_since is None:
+                return
+            data = self._snapshot.to_dict()
+            self._dirty_since = None
+
+        tmp_path = self._config_path.with_suffix(self._config_path.suffix + ".tmp")
         try:
             self._config_path.parent.mkdir(parents=True, exist_ok=True)
-            data = {k: v for k, v in asdict(self).items() if not k.startswith("_")}
-            with open(self._config_path, "w", encoding="utf-8") as f:
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._config_path)
+            self._mtime = self._read_mtime()
             logger.debug("Configuration saved")
         except Exception as e:
             logger.error(f"Failed to save config: {e}")
 
-    def update(self, **kwargs: Any) -> None:
-        for key, value in kwargs.items():
-            if hasattr(self, key):
-                setattr(self, key, value)
-        self.save()
+    def _reload_if_changed(self) -> None:
+        mtime = self._read_mtime()
+        if not mtime or mtime == self._mtime:
+            return
+
+        try:
+            settings = self._read_settings(self._config_path)
+        except Exception as e:
+            logger.error(f"Failed to reload config: {e}")
+            return
+
+        with self._lock:
+            self._mtime = mtime
+            if self._dirty_since is not None:
+                return
+            self._swap(settings)
+        logger.info("Configuration reloaded from disk")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            dirty_since = self._dirty_since
+            if dirty_since is None:
+                timeout = self.RELOAD_INTERVAL
+            else:
+                timeout = max(0.0, dirty_since + self.SAVE_DELAY - time.monotonic())
+
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+            dirty_since = self._dirty_since
+            if dirty_since is not None:
+                if time.monotonic() - dirty_since >= self.SAVE_DELAY:
+                    self.flush()
+            else:
+                self._reload_if_changed()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        self._worker.join(timeout=5)
+        self.flush()
 
     def should_refund_stars(self, stars: int) -> bool:
-        if not 1 <= stars <= 5:
-            return False
-        return getattr(self, f"star_{stars}", False)
\ No newline at end of file
+        return self._snapshot.should_refund_stars(stars)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import heapq
+import logging
+import threading
+import time
+
+from ..utils.metrics import Metrics
+
+logger = logging.getLogger("FPC.AutoRefund.Debouncer")
+
+
+class FeedbackDebouncer:
+    def __init__(self, window: float, handler: Callable[[str, Any], None], metrics: Metrics):
+        self._window = window
+        self._handler = handler
+        self._metrics = metrics
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Any] = {}
+        self._deadlines: List[Tuple[float, str]] = []
+        self._in_flight = 0
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run,
+            name="AutoRefund-Debouncer",
+            daemon=True
+        )
+        self._thread.start()
+
+    def push(self, order_id: str, event: Any) -> None:
+        with self._cond:
+            if self._stopped:
+                run_inline = True
+            else:
+                run_inline = False
+                if order_id in self._pending:
+                    self._metrics.inc("feedback_coalesced")
+                else:
+                    heapq.heappush(self._deadlines, (time.monotonic() + self._window, order_id))
+                    self._cond.notify_all()
+                self._pending[order_id] = event
+
+        if run_inline:
+            self._handler(order_id, event)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _take_due(self) -> List[Tuple[str, Any]]:
+        with self._cond:
+            while not self._stopped:
+                if self._deadlines:
+                    timeout = self._deadlines[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+            now = time.monotonic()
+            due = []
+            while self._deadlines and (self._stopped or self._deadlines[0][0] <= now):
+                _, order_id = heapq.heappop(self._deadlines)
+                due.append((order_id, self._pending.pop(order_id)))
+            self._in_flight = len(due)
+            return due
+
+    def _run(self) -> None:
+        while True:
+            due = self._take_due()
+            for order_id, event in due:
+                try:
+                    self._handler(order_id, event)
+                except Exception as e:
+                    logger.error(f"Error handling debounced feedback for {order_id}: {e}")
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+                if self._stopped and not self._pending:
+                    return
+
+    def join(self) -> None:
+        with self._cond:
+            while self._pending or self._in_flight:
+                self._cond.wait()
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
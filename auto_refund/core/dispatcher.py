@@ -0,0 +1,97 @@
+from __future__ import annotations
+from typing import Any, Callable, List
+import logging
+import queue
+import threading
+import zlib
+
+logger = logging.getLogger("FPC.AutoRefund.Dispatcher")
+
+_STOP = object()
+
+
+class EventDispatcher:
+    STOP_POLL = 0.5
+
+    def __init__(self, workers: int, queue_size: int, put_timeout: float):
+        self._put_timeout = put_timeout
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._stop = threading.Event()
+        self.overflowed = 0
+
+        for index, q in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker,
+                args=(q,),
+                name=f"AutoRefund-Worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"Started {len(self._threads)} refund workers")
+
+    def _queue_for(self, key: str) -> queue.Queue:
+        return self._queues[zlib.crc32(key.encode()) % len(self._queues)]
+
+    def submit(self, key: str, handler: Callable[..., Any], *args: Any) -> bool:
+        if self._closed:
+            logger.warning(f"Dispatcher is stopped, running {key} inline")
+            handler(*args)
+            return True
+
+        try:
+            self._queue_for(key).put((handler, args), timeout=self._put_timeout)
+            return True
+        except queue.Full:
+            self.overflowed += 1
+            logger.warning(f"Worker queue is full, running {key} inline")
+            handler(*args)
+            return False
+
+    def pending(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def join(self) -> None:
+        for q in self._queues:
+            q.join()
+
+    def _worker(self, q: queue.Queue) -> None:
+        while True:
+            try:
+                item = q.get(timeout=self.STOP_POLL)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            try:
+                if item is _STOP:
+                    return
+                handler, args = item
+                handler(*args)
+            except Exception as e:
+                logger.error(f"Error in refund worker: {e}", exc_info=True)
+            finally:
+                q.task_done()
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+
+        pending = self.pending()
+        if pending:
+            logger.info(f"Draining {pending} queued events")
+
+        self._stop.set()
+        for q in self._queues:
+            try:
+                q.put_nowait(_STOP)
+            except queue.Full:
+                pass
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                logger.warning(f"{thread.name} did not finish in {timeout}s")
@@ -1,45 +1,142 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict, Optional
 import logging
+import time
 
 if TYPE_CHECKING:
     from cardinal import Cardinal
+    from FunPayAPI.types import OrderShortcut
 
 from FunPayAPI.updater.events import NewOrderEvent
 
 from .config import RefundConfig
 from ..utils.blacklist_manager import BlacklistManager
 from ..utils.notification_sender import NotificationSender
+from ..utils.ledger import RefundLedger
+from ..utils.chat_cache import ChatCache
+from ..utils.constants import AuditActions, LedgerActions, OutboxResults, RefundSources
+from ..utils.audit_log import AuditLog
+from ..utils.metrics import Metrics
+from ..utils.funpay_client import FunPayClient
+from ..utils.outbox import Outbox
+from ..utils.analytics import RefundAnalytics, lot_label
 
 logger = logging.getLogger("FPC.AutoRefund.OrderHandler")
 
 
 class OrderHandler:
-    def __init__(self, cardinal: Cardinal, config: RefundConfig):
+    def __init__(
+        self,
+        cardinal: Cardinal,
+        client: FunPayClient,
+        config: RefundConfig,
+        blacklist_manager: BlacklistManager,
+        ledger: RefundLedger,
+        chat_cache: ChatCache,
+        notification_sender: NotificationSender,
+        metrics: Metrics,
+        audit_log: AuditLog,
+        outbox: Outbox,
+        analytics: RefundAnalytics
+    ):
         self._cardinal = cardinal
+        self._client = client
         self._config = config
-        self._blacklist_manager = BlacklistManager(cardinal)
-        self._notification_sender = NotificationSender(cardinal, config)
+        self._blacklist_manager = blacklist_manager
+        self._ledger = ledger
+        self._chat_cache = chat_cache
+        self._notification_sender = notification_sender
+        self._metrics = metrics
+        self._audit_log = audit_log
+        self._outbox = outbox
+        self._analytics = analytics
+        self._outbox.on_refunded(RefundSources.ORDER, self._on_refunded)
 
-    def process_order(self, event: NewOrderEvent) -> None:
-        if not self._blacklist_manager.is_blacklisted(event.order.buyer_username):
-            return
+    def _within_limit(self, order: OrderShortcut) -> bool:
+        return order.sum <= self._config.snapshot.rule_for(order).max_price
 
-        if event.order.sum > self._config.max_price:
-            return
+    def accepts_order(self, order: OrderShortcut) -> bool:
+        if not self._blacklist_manager.is_blacklisted(order.buyer_username):
+            return False
 
-        try:
-            chat = self._cardinal.account.get_chat_by_name(event.order.buyer_username)
-            if not chat:
-                logger.warning(f"Chat not found for {event.order.buyer_username}")
-                return
+        return self._within_limit(order)
+
+    def accepts(self, event: NewOrderEvent) -> bool:
+        return self._within_limit(event.order)
+
+    def _resolve_chat_id(self, username: str) -> Optional[int]:
+        chat_id = self._chat_cache.get(username)
+        if chat_id is not None:
+            return chat_id
+
+        chat = self._client.get_chat_by_name(username)
+        if not chat:
+            return None
+
+        self._chat_cache.put(username, chat.id)
+        return chat.id
+
+    def _audit(self, order: OrderShortcut, action: str, reason: str, started: float) -> None:
+        self._audit_log.record(str(order.id), order.buyer_username, action, reason, sum=order.sum, started=started)
+        self._analytics.observe(action, reason, order.buyer_username, sum=order.sum, lot=lot_label(order))
 
-            self._cardinal.account.refund(event.order.id)
-            self._cardinal.account.send_message(chat.id, self._config.blacklist_message)
-            
-            self._notification_sender.send_order_refund_notification(event.order.buyer_username)
-            
-            logger.info(f"Refunded order from blacklisted user {event.order.buyer_username}")
+    def refund_order(self, order: OrderShortcut) -> bool:
+        started = time.perf_counter()
+        if self._ledger.get(str(order.id)) == LedgerActions.REFUNDED:
+            logger.debug(f"Order {order.id} already refunded")
+            self._audit(order, AuditActions.SKIPPED, "already_refunded", started)
+            return False
 
+        chat_id = self._resolve_chat_id(order.buyer_username)
+        if chat_id is None:
+            logger.warning(f"Chat not found for {order.buyer_username}")
+            self._audit(order, AuditActions.SKIPPED, "no_chat", started)
+            return False
+
+        result = self._outbox.refund(
+            str(order.id),
+            order.buyer_username,
+            (chat_id, self._config.snapshot.blacklist_message),
+            source=RefundSources.ORDER,
+            sum=order.sum,
+            lot=lot_label(order)
+        )
+        if result == OutboxResults.DUPLICATE:
+            self._audit(order, AuditActions.SKIPPED, "refund_pending", started)
+            logger.info(f"Refund of order {order.id} is already pending")
+            return False
+        if result == OutboxResults.QUEUED:
+            self._audit(order, AuditActions.QUEUED, "blacklisted", started)
+            logger.info(f"Refund of order {order.id} from blacklisted user queued for retry")
+            return False
+
+        self._metrics.inc("refunded")
+        self._audit(order, AuditActions.REFUNDED, "blacklisted", started)
+        self._notification_sender.send_order_refund_notification(order.buyer_username)
+        
+        logger.info(f"Refunded order from blacklisted user {order.buyer_username}")
+        return True
+
+    def _on_refunded(self, payload: Dict[str, Any]) -> None:
+        buyer = payload.get("buyer")
+        self._metrics.inc("refunded")
+        self._audit_log.record(payload["order_id"], buyer, AuditActions.REFUNDED, "blacklisted", sum=payload.get("sum"))
+        self._analytics.observe(
+            AuditActions.REFUNDED, "blacklisted", buyer, sum=payload.get("sum"), lot=payload.get("lot"), deferred=True
+        )
+        self._notification_sender.send_order_refund_notification(buyer)
+        logger.info(f"Queued refund of order {payload['order_id']} from blacklisted user {buyer} completed")
+
+    def handle(self, event: NewOrderEvent) -> None:
+        try:
+            if not self._blacklist_manager.is_blacklisted(event.order.buyer_username):
+                self._metrics.inc("orders_filtered")
+                return
+            self.refund_order(event.order)
         except Exception as e:
-            logger.error(f"Error processing order: {e}")
\ No newline at end of file
+            self._metrics.error(e)
+            logger.error(f"Error processing order: {e}")
+
+    def process_order(self, event: NewOrderEvent) -> None:
+        if self.accepts(event):
+            self.handle(event)
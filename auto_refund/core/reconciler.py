@@ -0,0 +1,197 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+import time
+
+if TYPE_CHECKING:
+    from FunPayAPI.types import OrderShortcut
+
+from FunPayAPI.types import OrderStatuses
+
+from .config import RefundConfig
+from .refund_processor import RefundProcessor
+from .order_handler import OrderHandler
+from ..utils.funpay_client import FunPayClient
+from ..utils.ledger import RefundLedger
+from ..utils.metrics import Metrics
+
+logger = logging.getLogger("FPC.AutoRefund.Reconciler")
+
+CHECKPOINT_PATH = Path("storage/plugins/auto_refund_reconcile.json")
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class Reconciler:
+    def __init__(
+        self,
+        client: FunPayClient,
+        config: RefundConfig,
+        ledger: RefundLedger,
+        refund_processor: RefundProcessor,
+        order_handler: OrderHandler,
+        metrics: Metrics,
+        checkpoint_path: Path = CHECKPOINT_PATH
+    ):
+        self._client = client
+        self._config = config
+        self._ledger = ledger
+        self._refund_processor = refund_processor
+        self._order_handler = order_handler
+        self._metrics = metrics
+        self._checkpoint_path = checkpoint_path
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, on_progress: Optional[ProgressCallback] = None) -> bool:
+        if self.running:
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(on_progress,),
+            name="AutoRefund-Reconciler",
+            daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self._checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Failed to load reconcile checkpoint: {e}")
+            return {}
+
+    def _save_checkpoint(self, state: Dict[str, Any]) -> None:
+        tmp_path = self._checkpoint_path.with_suffix(self._checkpoint_path.suffix + ".tmp")
+        try:
+            self._checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self._checkpoint_path)
+        except Exception as e:
+            logger.error(f"Failed to save reconcile checkpoint: {e}")
+
+    def _fetch_and_apply(self, order_id: str) -> bool:
+        try:
+            order = self._client.get_order(order_id)
+            return self._refund_processor.reconcile_order(order)
+        except Exception as e:
+            self._metrics.error(e)
+            logger.error(f"Error reconciling order {order_id}: {e}")
+            return False
+
+    def _refund_blacklisted(self, order: OrderShortcut) -> bool:
+        try:
+            return self._order_handler.refund_order(order)
+        except Exception as e:
+            self._metrics.error(e)
+            logger.error(f"Error reconciling order {order.id}: {e}")
+            return False
+
+    @staticmethod
+    def _order_time(order: OrderShortcut) -> Optional[float]:
+        date = getattr(order, "date", None)
+        return date.timestamp() if date is not None else None
+
+    def _process_page(self, sales: List[OrderShortcut], executor: ThreadPoolExecutor, state: Dict[str, Any]) -> bool:
+        settings = self._config.snapshot
+        reviewed: List[str] = []
+        more = True
+
+        for order in sales:
+            order_time = self._order_time(order)
+            if order_time is not None and order_time < state["since"]:
+                more = False
+                break
+
+            order_id = str(order.id)
+            state["processed"] += 1
+            if order.sum > settings.rule_for(order).max_price or self._ledger.get(order_id) is not None:
+                continue
+
+            if order.status == OrderStatuses.CLOSED:
+                reviewed.append(order_id)
+            elif order.status == OrderStatuses.PAID and self._order_handler.accepts_order(order):
+                if self._refund_blacklisted(order):
+                    state["refunded"] += 1
+
+        state["fetched"] += len(reviewed)
+        state["refunded"] += sum(executor.map(self._fetch_and_apply, reviewed))
+        return more
+
+    def _run(self, on_progress: Optional[ProgressCallback]) -> None:
+        settings = self._config.snapshot
+        checkpoint = self._load_checkpoint()
+        last_started_at = checkpoint.get("last_started_at")
+        state = checkpoint.get("run") or {
+            "cursor": None,
+            "since": (last_started_at or time.time()) - settings.reconcile_lookback,
+            "processed": 0,
+            "fetched": 0,
+            "refunded": 0,
+            "started_at": time.time(),
+        }
+        if checkpoint.get("run"):
+            logger.info(f"Resuming reconciliation after {state['processed']} orders")
+        else:
+            logger.info("Starting reconciliation")
+
+        limit = state["processed"] + settings.reconcile_max_orders
+        state["done"] = False
+        state["paused"] = False
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(1, settings.reconcile_parallelism),
+                thread_name_prefix="AutoRefund-Reconcile"
+            ) as executor:
+                while not self._stop.is_set():
+                    next_id, sales = self._client.get_sales(start_from=state["cursor"])
+                    more = self._process_page(sales, executor, state)
+                    state["cursor"] = next_id
+                    self._save_checkpoint({"last_started_at": last_started_at, "run": state})
+
+                    if not more or not next_id:
+                        state["done"] = True
+                        break
+                    if state["processed"] >= limit:
+                        state["paused"] = True
+                        break
+                    if on_progress:
+                        on_progress(dict(state))
+        except Exception as e:
+            self._metrics.error(e)
+            logger.error(f"Reconciliation interrupted: {e}")
+
+        if state["done"]:
+            self._save_checkpoint({"last_started_at": state["started_at"]})
+            logger.info(
+                f"Reconciliation finished: {state['processed']} orders checked, "
+                f"{state['fetched']} fetched, {state['refunded']} refunded"
+            )
+        elif state["paused"]:
+            logger.info(
+                f"Reconciliation paused after {state['processed']} orders "
+                "(reconcile_max_orders), the next run continues from there"
+            )
+        if on_progress:
+            on_progress(dict(state))
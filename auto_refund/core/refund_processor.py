@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
 import logging
+import time
 
 if TYPE_CHECKING:
     from cardinal import Cardinal
@@ -12,16 +13,63 @@ from FunPayAPI.common.utils import RegularExpressions
 from .config import RefundConfig
 from ..utils.blacklist_manager import BlacklistManager
 from ..utils.notification_sender import NotificationSender
+from ..utils.ledger import RefundLedger
+from ..utils.chat_cache import ChatCache
+from ..utils.constants import AuditActions, LedgerActions, OutboxResults, RefundSources
+from ..utils.audit_log import AuditLog
+from ..utils.order_index import OrderIndex, OrderSummary
+from ..utils.outbox import Outbox
+from ..utils.analytics import RefundAnalytics, lot_label
+from ..utils.metrics import Metrics
+from ..utils.funpay_client import FunPayClient
 
 logger = logging.getLogger("FPC.AutoRefund.Processor")
 
 
 class RefundProcessor:
-    def __init__(self, cardinal: Cardinal, config: RefundConfig):
+    def __init__(
+        self,
+        cardinal: Cardinal,
+        client: FunPayClient,
+        config: RefundConfig,
+        blacklist_manager: BlacklistManager,
+        ledger: RefundLedger,
+        chat_cache: ChatCache,
+        notification_sender: NotificationSender,
+        metrics: Metrics,
+        audit_log: AuditLog,
+        order_index: OrderIndex,
+        outbox: Outbox,
+        analytics: RefundAnalytics
+    ):
         self._cardinal = cardinal
+        self._client = client
         self._config = config
-        self._blacklist_manager = BlacklistManager(cardinal)
-        self._notification_sender = NotificationSender(cardinal, config)
+        self._blacklist_manager = blacklist_manager
+        self._ledger = ledger
+        self._chat_cache = chat_cache
+        self._notification_sender = notification_sender
+        self._metrics = metrics
+        self._audit_log = audit_log
+        self._order_index = order_index
+        self._outbox = outbox
+        self._analytics = analytics
+        self._outbox.on_refunded(RefundSources.FEEDBACK, self._on_refunded)
+
+    def _audit(
+        self,
+        order_id: str,
+        order: Union[types.Order, OrderSummary, None],
+        action: str,
+        reason: Optional[str],
+        started: float
+    ) -> None:
+        review = getattr(order, "review", None)
+        buyer = getattr(order, "buyer_username", None)
+        stars = getattr(review, "stars", None)
+        order_sum = getattr(order, "sum", None)
+        self._audit_log.record(order_id, buyer, action, reason, stars=stars, sum=order_sum, started=started)
+        self._analytics.observe(action, reason, buyer, stars, order_sum, lot_label(order))
 
     def _is_valid_message(self, event: NewMessageEvent) -> bool:
         if event.message.type not in (
@@ -42,73 +90,212 @@ class RefundProcessor:
             raise ValueError("Order ID not found")
         return matches[0][1:]
 
-    def _process_feedback_deleted(self, event: NewMessageEvent) -> None:
-        if not self._config.feedback_delete:
-            return
-
+    def _process_feedback_deleted(self, event: NewMessageEvent, order_id: str) -> None:
+        started = time.perf_counter()
         try:
-            order_id = self._extract_order_id(str(event.message))
-            order = self._cardinal.account.get_order(order_id)
+            if self._ledger.get(order_id) is not None:
+                logger.debug(f"Order {order_id} already processed")
+                self._audit(order_id, None, AuditActions.SKIPPED, "already_processed", started)
+                return
+
+            summary = self._order_index.get(order_id)
+            if summary is not None:
+                if summary.sum > self._config.snapshot.rule_for(summary).max_price:
+                    self._metrics.inc("get_order_skipped")
+                    self._audit(order_id, summary, AuditActions.SKIPPED, "max_price", started)
+                    return
+                if self._blacklist_manager.is_blacklisted(summary.buyer_username):
+                    self._metrics.inc("get_order_skipped")
+                    self._ledger.record(order_id, LedgerActions.BANNED, summary.buyer_username)
+                    self._audit(order_id, summary, AuditActions.SKIPPED, "already_blacklisted", started)
+                    return
+
+            order = self._client.get_order(order_id)
+            self._chat_cache.put(order.buyer_username, event.message.chat_id)
             
             if order.status == types.OrderStatuses.REFUNDED:
+                self._ledger.record(order_id, LedgerActions.REFUNDED, order.buyer_username)
+                self._audit(order_id, order, AuditActions.SKIPPED, "already_refunded", started)
                 return
             
-            if order.sum > self._config.max_price:
+            settings = self._config.snapshot
+            if order.sum > settings.rule_for(order).max_price:
+                self._audit(order_id, order, AuditActions.SKIPPED, "max_price", started)
                 return
 
             if self._blacklist_manager.is_blacklisted(order.buyer_username):
+                self._ledger.record(order_id, LedgerActions.BANNED, order.buyer_username)
+                self._audit(order_id, order, AuditActions.SKIPPED, "already_blacklisted", started)
                 logger.info(f"User {order.buyer_username} already blacklisted")
                 return
 
-            self._blacklist_manager.add_to_blacklist(order.buyer_username)
-            self._cardinal.account.send_message(
+            self._blacklist_manager.add_to_blacklist(
+                order.buyer_username,
+                ttl=settings.ban_ttl_feedback_deleted,
+                reason="feedback_deleted"
+            )
+            self._outbox.send_message(
                 event.message.chat_id,
-                self._config.blacklist_message
+                settings.blacklist_message,
+                key=order_id
             )
+            self._ledger.record(order_id, LedgerActions.BANNED, order.buyer_username)
+            self._metrics.inc("banned")
+            self._audit(order_id, order, AuditActions.BANNED, "feedback_deleted", started)
             self._notification_sender.send_blacklist_notification(order.buyer_username)
             
             logger.info(f"Blacklisted {order.buyer_username} for feedback deletion")
 
         except Exception as e:
+            self._metrics.error(e)
             logger.error(f"Error processing deleted feedback: {e}")
 
-    def _process_feedback(self, event: NewMessageEvent) -> None:
-        try:
-            order_id = self._extract_order_id(str(event.message))
-            order = self._cardinal.account.get_order(order_id)
-            
-            if order.sum > self._config.max_price:
-                logger.debug(f"Order sum {order.sum} exceeds max {self._config.max_price}")
-                return
+    def _apply_feedback_rules(
+        self,
+        order_id: str,
+        order: types.Order,
+        chat_id: Optional[int],
+        started: float,
+        quiet: bool = False
+    ) -> bool:
+        if order.status == types.OrderStatuses.REFUNDED:
+            self._ledger.record(order_id, LedgerActions.REFUNDED, order.buyer_username)
+            self._audit(order_id, order, AuditActions.SKIPPED, "already_refunded", started)
+            return False
+        
+        settings = self._config.snapshot
+        rule = settings.rule_for(order)
+        if order.sum > rule.max_price:
+            logger.debug(f"Order sum {order.sum} exceeds max {rule.max_price}")
+            self._audit(order_id, order, AuditActions.SKIPPED, "max_price", started)
+            return False
 
-            if not order.review:
-                return
+        if not order.review:
+            if not quiet:
+                self._audit(order_id, order, AuditActions.SKIPPED, "no_review", started)
+            return False
 
-            if not self._config.should_refund_stars(order.review.stars):
-                return
+        if not rule.should_refund_stars(order.review.stars):
+            if not quiet:
+                self._audit(order_id, order, AuditActions.SKIPPED, "stars", started)
+            return False
 
-            was_blacklisted = self._blacklist_manager.is_blacklisted(order.buyer_username)
-            
-            self._cardinal.account.refund(order_id)
+        was_blacklisted = self._blacklist_manager.is_blacklisted(order.buyer_username)
+        message = None
+        if not was_blacklisted and chat_id is not None:
+            message = (chat_id, settings.blacklist_message)
+        reason = f"stars_{order.review.stars}"
+        
+        result = self._outbox.refund(
+            order_id,
+            order.buyer_username,
+            message,
+            source=RefundSources.FEEDBACK,
+            reason=reason,
+            stars=order.review.stars,
+            sum=order.sum,
+            lot=lot_label(order),
+            banned=not was_blacklisted
+        )
+        if result == OutboxResults.DUPLICATE:
+            self._audit(order_id, order, AuditActions.SKIPPED, "refund_pending", started)
+            logger.info(f"Refund of order {order_id} is already pending")
+            return False
+
+        if result == OutboxResults.DONE:
+            self._metrics.inc("refunded")
+            self._audit(order_id, order, AuditActions.REFUNDED, reason, started)
             logger.info(f"Refunded order {order_id}")
-            
-            if not was_blacklisted:
-                self._blacklist_manager.add_to_blacklist(order.buyer_username)
-                self._cardinal.account.send_message(
-                    event.message.chat_id,
-                    self._config.blacklist_message
-                )
+        else:
+            self._audit(order_id, order, AuditActions.QUEUED, reason, started)
+            logger.info(f"Refund of order {order_id} queued for retry")
+        
+        if not was_blacklisted:
+            self._blacklist_manager.add_to_blacklist(
+                order.buyer_username,
+                ttl=settings.ban_ttl_bad_review,
+                reason="refunded"
+            )
+            self._metrics.inc("banned")
+            self._audit(order_id, order, AuditActions.BANNED, "refunded", started)
+            if result == OutboxResults.DONE:
                 self._notification_sender.send_refund_notification(order.buyer_username)
-                logger.info(f"Blacklisted and refunded for {order.buyer_username}")
+            else:
+                self._notification_sender.send_refund_queued_notification(order.buyer_username)
+            logger.info(f"Blacklisted and refunded for {order.buyer_username}")
+
+        return True
+
+    def _on_refunded(self, payload: Dict[str, Any]) -> None:
+        buyer = payload.get("buyer")
+        reason = payload.get("reason")
+        stars = payload.get("stars")
+        order_sum = payload.get("sum")
+        self._metrics.inc("refunded")
+        self._audit_log.record(payload["order_id"], buyer, AuditActions.REFUNDED, reason, stars=stars, sum=order_sum)
+        self._analytics.observe(
+            AuditActions.REFUNDED, reason, buyer, stars, order_sum, payload.get("lot"), deferred=True
+        )
+        if payload.get("banned"):
+            self._notification_sender.send_refund_notification(buyer)
+        logger.info(f"Queued refund of order {payload['order_id']} completed")
+
+    def _process_feedback(self, event: NewMessageEvent, order_id: str) -> None:
+        started = time.perf_counter()
+        try:
+            if self._ledger.get(order_id) == LedgerActions.REFUNDED:
+                logger.debug(f"Order {order_id} already refunded")
+                self._audit(order_id, None, AuditActions.SKIPPED, "already_refunded", started)
+                return
+
+            summary = self._order_index.get(order_id)
+            if summary is not None:
+                rule = self._config.snapshot.rule_for(summary)
+                if summary.sum > rule.max_price or not rule.star_mask:
+                    self._metrics.inc("get_order_skipped")
+                    reason = "max_price" if summary.sum > rule.max_price else "stars"
+                    self._audit(order_id, summary, AuditActions.SKIPPED, reason, started)
+                    return
+
+            order = self._client.get_order(order_id)
+            self._chat_cache.put(order.buyer_username, event.message.chat_id)
+            self._apply_feedback_rules(order_id, order, event.message.chat_id, started)
 
         except Exception as e:
+            self._metrics.error(e)
             logger.error(f"Error processing feedback: {e}")
 
-    def process_feedback(self, event: NewMessageEvent) -> None:
+    def reconcile_order(self, order: types.Order) -> bool:
+        started = time.perf_counter()
+        order_id = str(order.id)
+        if self._ledger.get(order_id) == LedgerActions.REFUNDED:
+            return False
+
+        chat_id = getattr(order, "chat_id", None)
+        if chat_id is not None:
+            self._chat_cache.put(order.buyer_username, chat_id)
+        return self._apply_feedback_rules(order_id, order, chat_id, started, quiet=True)
+
+    def classify(self, event: NewMessageEvent) -> Optional[str]:
         if not self._is_valid_message(event):
-            return
+            return None
 
+        if event.message.type == MessageTypes.FEEDBACK_DELETED and not self._config.snapshot.feedback_delete:
+            return None
+
+        try:
+            return self._extract_order_id(str(event.message))
+        except ValueError as e:
+            logger.error(f"Error classifying feedback: {e}")
+            return None
+
+    def handle(self, event: NewMessageEvent, order_id: str) -> None:
         if event.message.type == MessageTypes.FEEDBACK_DELETED:
-            self._process_feedback_deleted(event)
+            self._process_feedback_deleted(event, order_id)
         else:
-            self._process_feedback(event)
\ No newline at end of file
+            self._process_feedback(event, order_id)
+
+    def process_feedback(self, event: NewMessageEvent) -> None:
+        order_id = self.classify(event)
+        if order_id is not None:
+            self.handle(event, order_id)
\ No newline at end of file
@@ -0,0 +1,108 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Optional, Tuple
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger("FPC.AutoRefund.Rules")
+
+SUBCATEGORY = "subcategory"
+CATEGORY = "category"
+CURRENCY = "currency"
+
+RuleKey = Tuple[str, Optional[int], Optional[str]]
+
+
+class RefundRule:
+    __slots__ = ("max_price", "star_mask")
+
+    def __init__(self, max_price: float, star_mask: int):
+        self.max_price = max_price
+        self.star_mask = star_mask
+
+    def should_refund_stars(self, stars: int) -> bool:
+        return 0 < stars < 6 and bool(self.star_mask >> stars & 1)
+
+
+def _stars_to_mask(stars: Iterable[int]) -> int:
+    mask = 0
+    for star in stars:
+        star = int(star)
+        if not 0 < star < 6:
+            raise ValueError(f"invalid star rating {star}")
+        mask |= 1 << star
+    return mask
+
+
+@lru_cache(maxsize=64)
+def _currency_code(currency: Any) -> Optional[str]:
+    if currency is None:
+        return None
+    return str(getattr(currency, "name", currency)).upper()
+
+
+class RuleTable:
+    def __init__(self, default: RefundRule, rules: Dict[RuleKey, RefundRule]):
+        self.default = default
+        self._rules = rules
+        self._scoped = bool(rules)
+        self._has_currency = any(key[2] is not None for key in rules)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    @classmethod
+    def compile(cls, max_price: float, star_mask: int, rules: Iterable[Dict[str, Any]]) -> RuleTable:
+        default = RefundRule(max_price, star_mask)
+        table: Dict[RuleKey, RefundRule] = {}
+
+        for raw in rules:
+            try:
+                if SUBCATEGORY in raw:
+                    scope, scope_id = SUBCATEGORY, int(raw[SUBCATEGORY])
+                elif CATEGORY in raw:
+                    scope, scope_id = CATEGORY, int(raw[CATEGORY])
+                elif CURRENCY in raw:
+                    scope, scope_id = CURRENCY, None
+                else:
+                    raise ValueError("rule needs subcategory, category or currency")
+
+                currency = _currency_code(raw.get(CURRENCY))
+                rule = RefundRule(
+                    float(raw.get("max_price", max_price)),
+                    _stars_to_mask(raw["stars"]) if "stars" in raw else star_mask
+                )
+            except (TypeError, ValueError, KeyError) as e:
+                logger.error(f"Skipping invalid refund rule {raw}: {e}")
+                continue
+
+            table[(scope, scope_id, currency)] = rule
+
+        return cls(default, table)
+
+    def lookup(self, order: Any) -> RefundRule:
+        if not self._scoped:
+            return self.default
+
+        rules = self._rules
+        currency = _currency_code(getattr(order, "currency", None)) if self._has_currency else None
+        subcategory = getattr(order, "subcategory", None)
+
+        if subcategory is not None:
+            subcategory_id = getattr(subcategory, "id", None)
+            rule = (currency and rules.get((SUBCATEGORY, subcategory_id, currency))) \
+                or rules.get((SUBCATEGORY, subcategory_id, None))
+            if rule is not None:
+                return rule
+
+            category_id = getattr(getattr(subcategory, "category", None), "id", None)
+            rule = (currency and rules.get((CATEGORY, category_id, currency))) \
+                or rules.get((CATEGORY, category_id, None))
+            if rule is not None:
+                return rule
+
+        if currency:
+            rule = rules.get((CURRENCY, None, currency))
+            if rule is not None:
+                return rule
+
+        return self.default
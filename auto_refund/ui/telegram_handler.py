@@ -1,123 +1,328 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
 import logging
+import tempfile
+import threading
+import time
 
 if TYPE_CHECKING:
     from telebot import TeleBot
     from telebot.types import CallbackQuery, Message
     from tg_bot import TgBot
 
+    from ..core.config import RefundConfig
+    from ..core.reconciler import Reconciler
+    from ..utils.metrics import Metrics
+    from ..utils.audit_log import AuditLog
+    from ..utils.analytics import RefundAnalytics
+    from ..utils.blacklist_manager import BlacklistManager
+
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from ..core.config import RefundConfig
+from ..utils.blacklist_io import ImportStats, chunked, iter_usernames, write_usernames
 from ..utils.constants import UIConstants, CallbackData
 from tg_bot import CBT
 
 logger = logging.getLogger("FPC.AutoRefund.TelegramUI")
 
 
+class _SettingsView:
+    __slots__ = ("version", "signature", "text", "markup")
+
+    def __init__(self, version: int, signature: Tuple[Any, ...], text: str, markup: InlineKeyboardMarkup):
+        self.version = version
+        self.signature = signature
+        self.text = text
+        self.markup = markup
+
+
 class TelegramUIHandler:
-    def __init__(self, bot: TeleBot, tg: TgBot, config: RefundConfig, uuid: str):
+    RENDERED_LIMIT = 256
+    HISTORY_LIMIT = 30
+    PROGRESS_INTERVAL = 1.0
+    IMPORT_CHUNK = 5000
+    DOWNLOAD_TIMEOUT = 60
+    FILE_URL = "https://api.telegram.org/file/bot{0}/{1}"
+    BROWSE_PAGE_SIZE = 10
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        tg: TgBot,
+        uuid: str,
+        start: Callable[[], bool]
+    ):
         self._bot = bot
         self._tg = tg
-        self._config = config
         self._uuid = uuid
+        self._start = start
+        self._attached = False
         self._awaiting_price: set[int] = set()
         self._awaiting_text: set[int] = set()
+        self._awaiting_import: set[int] = set()
+        self._awaiting_search: set[int] = set()
+        self._browse_prefix: Dict[int, str] = {}
+        self._browse_pages: OrderedDict[Tuple[int, int], Tuple[int, List[str], str]] = OrderedDict()
+        self._settings_prefix = f"{CBT.PLUGIN_SETTINGS}:{uuid}"
+        self._settings_view: Optional[_SettingsView] = None
+        self._rendered: OrderedDict[Tuple[int, int], _SettingsView] = OrderedDict()
+        self._callbacks: Dict[str, Callable[[CallbackQuery], None]] = {
+            CallbackData.SWITCH: self._toggle_setting,
+            CallbackData.PRICE_CHANGE: self._request_price,
+            CallbackData.TEXT_CHANGE: self._request_text,
+            CallbackData.STATS: self._show_stats,
+            CallbackData.ANALYTICS: self._show_analytics,
+            CallbackData.RECONCILE: self._start_reconcile,
+            CallbackData.BLACKLIST_IMPORT: self._request_import,
+            CallbackData.BLACKLIST_EXPORT: self._export_blacklist,
+            CallbackData.BLACKLIST_BROWSE: self._show_blacklist,
+            CallbackData.BLACKLIST_SEARCH: self._request_search,
+            CallbackData.BLACKLIST_UNBAN: self._unban,
+        }
+
+    def attach(
+        self,
+        config: RefundConfig,
+        metrics: Metrics,
+        reconciler: Reconciler,
+        audit_log: AuditLog,
+        blacklist_manager: BlacklistManager,
+        analytics: RefundAnalytics
+    ) -> None:
+        self._config = config
+        self._metrics = metrics
+        self._reconciler = reconciler
+        self._audit_log = audit_log
+        self._blacklist_manager = blacklist_manager
+        self._analytics = analytics
+        self._attached = True
+
+    def _when_started(self, handler: Callable[[Any], None]) -> Callable[[Any], None]:
+        def wrapper(update: Any) -> None:
+            if self._attached or self._start():
+                handler(update)
+
+        return wrapper
 
     def register_handlers(self) -> None:
-        self._tg.cbq_handler(self._show_settings, lambda c: f"{CBT.PLUGIN_SETTINGS}:{self._uuid}" in c.data)
-        self._tg.cbq_handler(self._toggle_setting, lambda c: CallbackData.SWITCH in c.data)
-        self._tg.cbq_handler(self._request_price, lambda c: CallbackData.PRICE_CHANGE in c.data)
-        self._tg.cbq_handler(self._request_text, lambda c: CallbackData.TEXT_CHANGE in c.data)
+        guard = self._when_started
+        self._tg.cbq_handler(guard(self._open_settings), lambda c: c.data.startswith(self._settings_prefix))
+        self._tg.cbq_handler(guard(self._dispatch_callback), lambda c: c.data.split(":", 1)[0] in self._callbacks)
         
-        self._tg.msg_handler(self._handle_price_input, func=lambda m: m.from_user.id in self._awaiting_price)
-        self._tg.msg_handler(self._handle_text_input, func=lambda m: m.from_user.id in self._awaiting_text)
+        self._tg.msg_handler(guard(self._handle_stats_command), commands=["ar_stats"])
+        self._tg.msg_handler(guard(self._handle_history_command), commands=["ar_history"])
+        self._tg.msg_handler(guard(self._handle_price_input), func=lambda m: m.from_user.id in self._awaiting_price)
+        self._tg.msg_handler(guard(self._handle_text_input), func=lambda m: m.from_user.id in self._awaiting_text)
+        self._tg.msg_handler(guard(self._handle_search_input), func=lambda m: m.from_user.id in self._awaiting_search)
+        self._tg.msg_handler(
+            guard(self._handle_import_document),
+            content_types=["document"],
+            func=lambda m: m.from_user.id in self._awaiting_import
+        )
+
+    def _dispatch_callback(self, call: CallbackQuery) -> None:
+        handler = self._callbacks.get(call.data.split(":", 1)[0])
+        if handler is not None:
+            handler(call)
+
+    def _render_settings(self) -> _SettingsView:
+        version = self._config.version
+        view = self._settings_view
+        if view is not None and view.version == version:
+            return view
+
+        settings = self._config.snapshot
+        rows: List[Tuple[Tuple[str, str], ...]] = [
+            ((f"Возврат до: {settings.max_price}₽", CallbackData.PRICE_CHANGE),),
+            ((f"Текст ЧС: {settings.blacklist_message[:20]}...", CallbackData.TEXT_CHANGE),),
+        ]
+        
+        options = [
+            ("Добавлять в ЧС", "block_user"),
+            ("Уведомления", "refund_notification"),
+            ("ЧС при удалении отзыва", "feedback_delete")
+        ]
+        
+        for label, key in options:
+            state = UIConstants.CHECK_MARK if getattr(settings, key) else UIConstants.CROSS_MARK
+            rows.append(((label, f"{CallbackData.SWITCH}:{key}"), (state, f"{CallbackData.SWITCH}:{key}")))
+        
+        rows.append((("⭐ Настройка звезд", "dummy"),))
+        
+        for stars in range(1, 6):
+            state = "🟢" if settings.should_refund_stars(stars) else "🔴"
+            rows.append((("⭐" * stars, f"{CallbackData.SWITCH}:star_{stars}"), (state, f"{CallbackData.SWITCH}:star_{stars}")))
+        
+        rows.append((("📋 Черный список", f"{CallbackData.BLACKLIST_BROWSE}:0"),))
+        rows.append((("📥 Импорт ЧС", CallbackData.BLACKLIST_IMPORT), ("📤 Экспорт ЧС", CallbackData.BLACKLIST_EXPORT)))
+        rows.append((("📊 Статистика", CallbackData.STATS), ("📈 Аналитика", CallbackData.ANALYTICS)))
+        rows.append((("🔄 Обработать пропущенные отзывы", CallbackData.RECONCILE),))
+        rows.append((("◀️ Назад", f"{CBT.EDIT_PLUGIN}:{self._uuid}:0"),))
+        
+        text = (
+            "⚙️ Настройки автовозврата\n\n"
+            f"💰 Максимальная сумма: {settings.max_price}₽\n"
+            f"📛 ЧС активен: {UIConstants.CHECK_MARK if settings.block_user else UIConstants.CROSS_MARK}\n"
+            f"🔔 Уведомления: {UIConstants.CHECK_MARK if settings.refund_notification else UIConstants.CROSS_MARK}"
+        )
+        
+        signature = (text, tuple(rows))
+        if view is not None and view.signature == signature:
+            view.version = version
+            return view
+
+        kb = InlineKeyboardMarkup()
+        for row in rows:
+            kb.row(*(InlineKeyboardButton(label, callback_data=data) for label, data in row))
+
+        view = self._settings_view = _SettingsView(version, signature, text, kb)
+        return view
+
+    def _open_settings(self, call: CallbackQuery) -> None:
+        self._rendered.pop((call.message.chat.id, call.message.id), None)
+        self._show_settings(call)
 
     def _show_settings(self, call: CallbackQuery) -> None:
         try:
-            kb = InlineKeyboardMarkup()
+            view = self._render_settings()
+            key = (call.message.chat.id, call.message.id)
             
-            kb.add(
-                InlineKeyboardButton(
-                    f"Возврат до: {self._config.max_price}₽",
-                    callback_data=CallbackData.PRICE_CHANGE
+            if self._rendered.get(key) is not view:
+                self._bot.edit_message_text(
+                    view.text,
+                    call.message.chat.id,
+                    call.message.id,
+                    reply_markup=view.markup
                 )
+                self._rendered[key] = view
+                self._rendered.move_to_end(key)
+                if len(self._rendered) > self.RENDERED_LIMIT:
+                    self._rendered.popitem(last=False)
+            self._bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error showing settings: {e}")
+
+    def _show_stats(self, call: CallbackQuery) -> None:
+        try:
+            self._rendered.pop((call.message.chat.id, call.message.id), None)
+            kb = InlineKeyboardMarkup()
+            kb.row(
+                InlineKeyboardButton("🔄 Обновить", callback_data=CallbackData.STATS),
+                InlineKeyboardButton("◀️ К настройкам", callback_data=f"{CBT.PLUGIN_SETTINGS}:{self._uuid}")
             )
-            
-            preview_text = self._config.blacklist_message[:20] + "..."
-            kb.add(
-                InlineKeyboardButton(
-                    f"Текст ЧС: {preview_text}",
-                    callback_data=CallbackData.TEXT_CHANGE
-                )
+
+            self._bot.edit_message_text(
+                self._metrics.render_text(),
+                call.message.chat.id,
+                call.message.id,
+                reply_markup=kb
             )
-            
-            options = [
-                ("Добавлять в ЧС", "block_user"),
-                ("Уведомления", "refund_notification"),
-                ("ЧС при удалении отзыва", "feedback_delete")
-            ]
-            
-            for label, key in options:
-                state = UIConstants.CHECK_MARK if getattr(self._config, key) else UIConstants.CROSS_MARK
-                kb.add(
-                    InlineKeyboardButton(
-                        label,
-                        callback_data=f"{CallbackData.SWITCH}:{key}"
-                    ),
-                    InlineKeyboardButton(
-                        state,
-                        callback_data=f"{CallbackData.SWITCH}:{key}"
-                    )
-                )
-            
-            kb.add(InlineKeyboardButton("⭐ Настройка звезд", callback_data="dummy"))
-            
-            for stars in range(1, 6):
-                state = "🟢" if getattr(self._config, f"star_{stars}") else "🔴"
-                kb.row(
-                    InlineKeyboardButton(
-                        "⭐" * stars,
-                        callback_data=f"{CallbackData.SWITCH}:star_{stars}"
-                    ),
-                    InlineKeyboardButton(
-                        state,
-                        callback_data=f"{CallbackData.SWITCH}:star_{stars}"
-                    )
-                )
-            
-            kb.add(InlineKeyboardButton("◀️ Назад", callback_data=f"{CBT.EDIT_PLUGIN}:{self._uuid}:0"))
-            
-            text = (
-                "⚙️ Настройки автовозврата\n\n"
-                f"💰 Максимальная сумма: {self._config.max_price}₽\n"
-                f"📛 ЧС активен: {UIConstants.CHECK_MARK if self._config.block_user else UIConstants.CROSS_MARK}\n"
-                f"🔔 Уведомления: {UIConstants.CHECK_MARK if self._config.refund_notification else UIConstants.CROSS_MARK}"
+            self._bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error showing stats: {e}")
+
+    def _show_analytics(self, call: CallbackQuery) -> None:
+        try:
+            self._rendered.pop((call.message.chat.id, call.message.id), None)
+            kb = InlineKeyboardMarkup()
+            kb.row(
+                InlineKeyboardButton("🔄 Обновить", callback_data=CallbackData.ANALYTICS),
+                InlineKeyboardButton("◀️ К настройкам", callback_data=f"{CBT.PLUGIN_SETTINGS}:{self._uuid}")
             )
-            
+
             self._bot.edit_message_text(
-                text,
+                self._analytics.render_text(),
                 call.message.chat.id,
                 call.message.id,
                 reply_markup=kb
             )
             self._bot.answer_callback_query(call.id)
         except Exception as e:
-            logger.error(f"Error showing settings: {e}")
+            logger.error(f"Error showing analytics: {e}")
+
+    def _handle_stats_command(self, message: Message) -> None:
+        try:
+            self._bot.send_message(message.chat.id, self._metrics.render_text())
+        except Exception as e:
+            logger.error(f"Error sending stats: {e}")
+
+    def _handle_history_command(self, message: Message) -> None:
+        try:
+            args = message.text.split(maxsplit=1)
+            if len(args) < 2:
+                self._bot.reply_to(message, "Использование: /ar_history <username> или /ar_history #ЗАКАЗ")
+                return
+
+            query = args[1].strip()
+            if query.startswith("#"):
+                entries = self._audit_log.history_for_order(query[1:])
+            else:
+                entries = self._audit_log.history_for_user(query, self.HISTORY_LIMIT)
+
+            if not entries:
+                self._bot.reply_to(message, f"📜 По запросу {query} записей нет")
+                return
+
+            lines = [f"📜 История решений: {query}", ""]
+            for entry in entries:
+                stamp = time.strftime("%d.%m.%Y %H:%M:%S", time.localtime(entry["ts"]))
+                details = [f"{entry['action']} ({entry['reason']})" if entry["reason"] else entry["action"]]
+                if entry["sum"] is not None:
+                    details.append(f"{entry['sum']}₽")
+                if entry["stars"] is not None:
+                    details.append("⭐" * entry["stars"])
+                details.append(f"{entry['latency_ms']:.0f}мс")
+                lines.append(f"{stamp} #{entry['order_id']} {entry['buyer'] or ''}: {', '.join(details)}")
+
+            self._bot.send_message(message.chat.id, "\n".join(lines))
+        except Exception as e:
+            logger.error(f"Error sending history: {e}")
+
+    def _start_reconcile(self, call: CallbackQuery) -> None:
+        try:
+            if self._reconciler.running:
+                self._bot.answer_callback_query(call.id, "Сверка уже выполняется", show_alert=True)
+                return
+
+            progress = self._bot.send_message(call.message.chat.id, "🔄 Сверка заказов запущена...")
+
+            def on_progress(state: Dict[str, Any]) -> None:
+                if state["done"]:
+                    title = "✅ Сверка завершена"
+                elif state["paused"]:
+                    title = "⏸ Сверка приостановлена на лимите заказов, следующий запуск продолжит ее"
+                else:
+                    title = "🔄 Сверка заказов..."
+                try:
+                    self._bot.edit_message_text(
+                        f"{title}\n\n"
+                        f"Проверено заказов: {state['processed']}\n"
+                        f"Загружено для проверки отзыва: {state['fetched']}\n"
+                        f"Выполнено возвратов: {state['refunded']}",
+                        progress.chat.id,
+                        progress.id
+                    )
+                except Exception as e:
+                    logger.debug(f"Failed to update reconcile progress: {e}")
+
+            self._reconciler.start(on_progress)
+            self._bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error starting reconciliation: {e}")
 
     def _toggle_setting(self, call: CallbackQuery) -> None:
         try:
             setting = call.data.split(":")[1]
             
             if setting == "refund_notification":
-                current = self._config.refund_notification
+                current = self._config.snapshot.refund_notification
                 self._config.update(
                     refund_notification=not current,
                     refund_notification_chat_id=call.message.chat.id
                 )
             else:
-                current = getattr(self._config, setting, None)
+                current = getattr(self._config.snapshot, setting, None)
                 if current is not None:
                     self._config.update(**{setting: not current})
             
@@ -169,7 +374,7 @@ class TelegramUIHandler:
             self._awaiting_text.add(call.from_user.id)
             self._bot.send_message(
                 call.message.chat.id,
-                f"📛 Текущее сообщение:\n<code>{self._config.blacklist_message}</code>\n\n"
+                f"📛 Текущее сообщение:\n<code>{self._config.snapshot.blacklist_message}</code>\n\n"
                 "Введите новое сообщение для пользователей из ЧС:",
                 parse_mode="HTML"
             )
@@ -191,4 +396,195 @@ class TelegramUIHandler:
                 reply_markup=kb
             )
         except Exception as e:
-            logger.error(f"Error handling text: {e}")
\ No newline at end of file
+            logger.error(f"Error handling text: {e}")
+
+    def _request_import(self, call: CallbackQuery) -> None:
+        try:
+            self._awaiting_import.add(call.from_user.id)
+            self._bot.send_message(
+                call.message.chat.id,
+                "📥 Отправьте TXT или CSV файл с никами (по одному в строке, ник в первой колонке).\n"
+                "Пользователи, которые уже есть в ЧС, будут пропущены."
+            )
+            self._bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error requesting blacklist import: {e}")
+
+    def _handle_import_document(self, message: Message) -> None:
+        self._awaiting_import.discard(message.from_user.id)
+        threading.Thread(
+            target=self._import_document,
+            args=(message,),
+            name="AutoRefund-BlacklistImport",
+            daemon=True
+        ).start()
+
+    def _open_document(self, file_path: str) -> Any:
+        import requests
+        from telebot import apihelper
+
+        url = (apihelper.FILE_URL or self.FILE_URL).format(self._bot.token, file_path)
+        response = requests.get(url, stream=True, proxies=apihelper.proxy, timeout=self.DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return response
+
+    def _import_document(self, message: Message) -> None:
+        try:
+            progress = self._bot.reply_to(message, "📥 Загрузка файла...")
+            file_info = self._bot.get_file(message.document.file_id)
+
+            stats = ImportStats()
+            last_update = [time.monotonic()]
+
+            def on_progress(current: ImportStats) -> None:
+                now = time.monotonic()
+                if now - last_update[0] < self.PROGRESS_INTERVAL:
+                    return
+                last_update[0] = now
+                try:
+                    self._bot.edit_message_text(
+                        f"📥 Обработано строк: {current.lines}",
+                        progress.chat.id,
+                        progress.id
+                    )
+                except Exception as e:
+                    logger.debug(f"Failed to update import progress: {e}")
+
+            with self._open_document(file_info.file_path) as response:
+                for names in chunked(iter_usernames(response.raw, stats, on_progress), self.IMPORT_CHUNK):
+                    stats.added += self._blacklist_manager.add_many(names)
+
+            self._bot.edit_message_text(
+                "✅ Импорт ЧС завершен\n\n"
+                f"Строк в файле: {stats.lines}\n"
+                f"Корректных ников: {stats.valid}\n"
+                f"Повторов в файле: {stats.duplicates}\n"
+                f"Некорректных строк: {stats.invalid}\n"
+                f"Уже были в ЧС: {stats.valid - stats.added}\n"
+                f"Добавлено: {stats.added}",
+                progress.chat.id,
+                progress.id
+            )
+        except Exception as e:
+            logger.error(f"Error importing blacklist: {e}")
+            try:
+                self._bot.reply_to(message, f"❌ Ошибка импорта: {e}")
+            except Exception as reply_error:
+                logger.debug(f"Failed to report import error: {reply_error}")
+
+    def _export_blacklist(self, call: CallbackQuery) -> None:
+        try:
+            self._bot.answer_callback_query(call.id, "📤 Готовлю файл...")
+            with tempfile.TemporaryFile() as f:
+                count = write_usernames(self._blacklist_manager.snapshot(), f)
+                f.seek(0)
+                self._bot.send_document(
+                    call.message.chat.id,
+                    f,
+                    visible_file_name="auto_refund_blacklist.txt",
+                    caption=f"📤 ЧС: {count} пользователей"
+                )
+        except Exception as e:
+            logger.error(f"Error exporting blacklist: {e}")
+
+    def _render_blacklist(self, chat_id: int, page: int) -> Tuple[int, List[str], str, InlineKeyboardMarkup]:
+        size = self.BROWSE_PAGE_SIZE
+        prefix = self._browse_prefix.get(chat_id, "")
+        total, names = self._blacklist_manager.browse(prefix, page * size, size)
+        pages = max(1, -(-total // size))
+        if page >= pages:
+            page = pages - 1
+            total, names = self._blacklist_manager.browse(prefix, page * size, size)
+
+        header = f"🔍 Поиск «{prefix}»: найдено {total}" if prefix else f"📋 Черный список: {total} пользователей"
+        text = f"{header}\nСтраница {page + 1}/{pages}"
+        if names:
+            text += "\n\nНажмите на пользователя, чтобы убрать его из ЧС"
+
+        kb = InlineKeyboardMarkup()
+        for i, name in enumerate(names):
+            kb.row(InlineKeyboardButton(f"❌ {name}", callback_data=f"{CallbackData.BLACKLIST_UNBAN}:{i}"))
+
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"{CallbackData.BLACKLIST_BROWSE}:{page - 1}"))
+        nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"{CallbackData.BLACKLIST_BROWSE}:{page}"))
+        if page + 1 < pages:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"{CallbackData.BLACKLIST_BROWSE}:{page + 1}"))
+        kb.row(*nav)
+
+        search = [InlineKeyboardButton("🔍 Поиск", callback_data=CallbackData.BLACKLIST_SEARCH)]
+        if prefix:
+            search.append(InlineKeyboardButton("✖️ Сбросить поиск", callback_data=f"{CallbackData.BLACKLIST_SEARCH}:clear"))
+        kb.row(*search)
+        kb.row(InlineKeyboardButton("◀️ К настройкам", callback_data=f"{CBT.PLUGIN_SETTINGS}:{self._uuid}"))
+        return page, names, text, kb
+
+    def _remember_page(self, key: Tuple[int, int], page: int, names: List[str], text: str) -> None:
+        self._browse_pages[key] = (page, names, text)
+        self._browse_pages.move_to_end(key)
+        if len(self._browse_pages) > self.RENDERED_LIMIT:
+            self._browse_pages.popitem(last=False)
+
+    def _edit_blacklist(self, call: CallbackQuery, page: int) -> None:
+        key = (call.message.chat.id, call.message.id)
+        self._rendered.pop(key, None)
+        page, names, text, kb = self._render_blacklist(call.message.chat.id, page)
+        if self._browse_pages.get(key) != (page, names, text):
+            self._bot.edit_message_text(text, call.message.chat.id, call.message.id, reply_markup=kb)
+            self._remember_page(key, page, names, text)
+
+    def _show_blacklist(self, call: CallbackQuery) -> None:
+        try:
+            _, _, page = call.data.partition(":")
+            self._edit_blacklist(call, int(page or 0))
+            self._bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error showing blacklist: {e}")
+
+    def _unban(self, call: CallbackQuery) -> None:
+        try:
+            shown = self._browse_pages.get((call.message.chat.id, call.message.id))
+            index = int(call.data.partition(":")[2])
+            if shown is None or index >= len(shown[1]):
+                self._bot.answer_callback_query(call.id, "Список устарел, обновляю")
+                self._edit_blacklist(call, shown[0] if shown else 0)
+                return
+
+            page, names, _ = shown
+            username = names[index]
+            self._blacklist_manager.remove_from_blacklist(username)
+            self._bot.answer_callback_query(call.id, f"✅ {username} удален из ЧС")
+            self._edit_blacklist(call, page)
+        except Exception as e:
+            logger.error(f"Error removing user from blacklist: {e}")
+
+    def _request_search(self, call: CallbackQuery) -> None:
+        try:
+            if call.data.endswith(":clear"):
+                self._browse_prefix.pop(call.message.chat.id, None)
+                self._edit_blacklist(call, 0)
+                self._bot.answer_callback_query(call.id)
+                return
+
+            self._awaiting_search.add(call.from_user.id)
+            self._bot.send_message(call.message.chat.id, "🔍 Введите начало ника:")
+            self._bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error requesting blacklist search: {e}")
+
+    def _handle_search_input(self, message: Message) -> None:
+        try:
+            self._awaiting_search.discard(message.from_user.id)
+            prefix = (message.text or "").strip().lstrip("@")[:64]
+            if prefix:
+                self._browse_prefix[message.chat.id] = prefix
+            else:
+                self._browse_prefix.pop(message.chat.id, None)
+
+            page, names, text, kb = self._render_blacklist(message.chat.id, 0)
+            sent = self._bot.send_message(message.chat.id, text, reply_markup=kb)
+            self._remember_page((message.chat.id, sent.id), page, names, text)
+        except Exception as e:
+            logger.error(f"Error handling blacklist search: {e}")
@@ -0,0 +1,232 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import heapq
+import logging
+import threading
+import time
+
+from .constants import AuditActions
+
+logger = logging.getLogger("FPC.AutoRefund.Analytics")
+
+DECISIONS = 0
+REFUNDS = 1
+BANS = 2
+REFUND_SUM = 3
+FIELDS = 4
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+
+class RingWindow:
+    __slots__ = ("width", "size", "_epochs", "_rows")
+
+    def __init__(self, width: float, size: int):
+        self.width = width
+        self.size = size
+        self._epochs = [-1] * size
+        self._rows = [[0.0] * FIELDS for _ in range(size)]
+
+    def _row(self, now: float) -> List[float]:
+        epoch = int(now // self.width)
+        slot = epoch % self.size
+        row = self._rows[slot]
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            row[:] = [0.0] * FIELDS
+        return row
+
+    def add(self, now: float, field: int, amount: float = 1.0) -> None:
+        self._row(now)[field] += amount
+
+    def series(self, now: float, field: int, last: Optional[int] = None) -> List[float]:
+        current = int(now // self.width)
+        count = min(last or self.size, self.size)
+        values = []
+        for epoch in range(current - count + 1, current + 1):
+            slot = epoch % self.size
+            values.append(self._rows[slot][field] if self._epochs[slot] == epoch else 0.0)
+        return values
+
+    def total(self, now: float, field: int, last: Optional[int] = None) -> float:
+        return sum(self.series(now, field, last))
+
+
+class SpaceSaving:
+    __slots__ = ("capacity", "_counts", "_errors")
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._counts: Dict[str, float] = {}
+        self._errors: Dict[str, float] = {}
+
+    def add(self, key: str, weight: float = 1.0) -> None:
+        counts = self._counts
+        if key in counts:
+            counts[key] += weight
+            return
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            self._errors[key] = 0.0
+            return
+
+        victim = min(counts, key=counts.__getitem__)
+        floor = counts.pop(victim)
+        del self._errors[victim]
+        counts[key] = floor + weight
+        self._errors[key] = floor
+
+    def top(self, n: int) -> List[Tuple[str, float, float]]:
+        items = heapq.nlargest(n, self._counts.items(), key=lambda item: item[1])
+        return [(key, count, self._errors[key]) for key, count in items]
+
+
+def lot_label(order: Any) -> Optional[str]:
+    subcategory = getattr(order, "subcategory", None)
+    if subcategory is None:
+        return getattr(order, "subcategory_name", None)
+    name = getattr(subcategory, "fullname", None) or getattr(subcategory, "name", None)
+    return name or f"#{getattr(subcategory, 'id', subcategory)}"
+
+
+def sparkline(values: List[float]) -> str:
+    peak = max(values, default=0.0)
+    if peak <= 0:
+        return SPARKS[0] * len(values)
+    return "".join(SPARKS[min(len(SPARKS) - 1, int(value / peak * (len(SPARKS) - 1)))] for value in values)
+
+
+class RefundAnalytics:
+    MINUTE = 60.0
+    HOUR = 3600.0
+    SPIKE_SPAN = 5
+    SPIKE_COOLDOWN = 1800.0
+    TOP = 10
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        spike_factor: float = 3.0,
+        spike_min: int = 10,
+        on_spike: Optional[Callable[[str], None]] = None
+    ):
+        self._lock = threading.Lock()
+        self._minutes = RingWindow(self.MINUTE, 60)
+        self._hours = RingWindow(self.HOUR, 24)
+        self._stars = [0] * 6
+        self._stars_refunded = [0] * 6
+        self._offenders = SpaceSaving(capacity)
+        self._lots = SpaceSaving(capacity)
+        self._spike_factor = spike_factor
+        self._spike_min = spike_min
+        self._on_spike = on_spike
+        self._last_spike = 0.0
+        self._started = time.time()
+
+    def observe(
+        self,
+        action: str,
+        reason: Optional[str],
+        buyer: Optional[str],
+        stars: Optional[int] = None,
+        sum: Optional[float] = None,
+        lot: Optional[str] = None,
+        deferred: bool = False
+    ) -> None:
+        now = time.time()
+        refunded = action == AuditActions.REFUNDED
+        banned = action == AuditActions.BANNED
+        alert = None
+
+        with self._lock:
+            for window in (self._minutes, self._hours):
+                if banned:
+                    window.add(now, BANS)
+                    continue
+                if not deferred:
+                    window.add(now, DECISIONS)
+                if refunded:
+                    window.add(now, REFUNDS)
+                    if sum:
+                        window.add(now, REFUND_SUM, sum)
+
+            if not banned and stars is not None and 0 < stars < 6:
+                if not deferred:
+                    self._stars[stars] += 1
+                if refunded:
+                    self._stars_refunded[stars] += 1
+
+            if buyer and (refunded or banned and reason == "feedback_deleted"):
+                self._offenders.add(buyer)
+            if refunded and lot:
+                self._lots.add(lot, sum or 0.0)
+
+            if refunded:
+                alert = self._check_spike(now)
+
+        if alert is not None and self._on_spike is not None:
+            logger.warning(alert)
+            try:
+                self._on_spike(alert)
+            except Exception as e:
+                logger.error(f"Failed to send spike alert: {e}")
+
+    def _check_spike(self, now: float) -> Optional[str]:
+        if self._spike_min <= 0 or now - self._last_spike < self.SPIKE_COOLDOWN:
+            return None
+        if now - self._started < self._minutes.width * self._minutes.size:
+            return None
+
+        recent = self._minutes.total(now, REFUNDS, self.SPIKE_SPAN)
+        if recent < self._spike_min:
+            return None
+        spans = self._minutes.size / self.SPIKE_SPAN - 1
+        baseline = (self._minutes.total(now, REFUNDS) - recent) / spans
+        if recent <= self._spike_factor * max(baseline, 1.0):
+            return None
+
+        self._last_spike = now
+        return (
+            f"[AutoRefund] ⚠️ Всплеск возвратов: {recent:.0f} за последние {self.SPIKE_SPAN} мин "
+            f"при обычных {baseline:.1f}"
+        )
+
+    @staticmethod
+    def _rate(refunds: float, decisions: float) -> str:
+        return f"{refunds / decisions * 100:.1f}%" if decisions else "—"
+
+    def _window_line(self, label: str, window: RingWindow, now: float) -> str:
+        decisions = window.total(now, DECISIONS)
+        refunds = window.total(now, REFUNDS)
+        return (
+            f"{label}: возвратов {refunds:.0f} ({self._rate(refunds, decisions)} решений), "
+            f"в ЧС {window.total(now, BANS):.0f}, сумма {window.total(now, REFUND_SUM):.2f}"
+        )
+
+    def render_text(self) -> str:
+        now = time.time()
+        with self._lock:
+            lines = [
+                "📈 Аналитика автовозврата",
+                "",
+                self._window_line("За час", self._minutes, now),
+                self._window_line("За сутки", self._hours, now),
+                "",
+                f"Возвраты по минутам (час): {sparkline(self._minutes.series(now, REFUNDS))}",
+                f"Возвраты по часам (сутки): {sparkline(self._hours.series(now, REFUNDS))}",
+                "",
+                "⭐ Оценки (всего / возвращено):",
+            ]
+            for stars in range(1, 6):
+                lines.append(f"{'⭐' * stars}: {self._stars[stars]} / {self._stars_refunded[stars]}")
+
+            lots = self._lots.top(self.TOP)
+            offenders = self._offenders.top(self.TOP)
+
+        if lots:
+            lines.extend(["", "💰 Сумма возвратов по лотам:"])
+            lines.extend(f"{'~' if error else ''}{total:.2f} — {lot}" for lot, total, error in lots)
+        if offenders:
+            lines.extend(["", "🔁 Повторные нарушители:"])
+            lines.extend(f"{'~' if error else ''}{count:.0f} — {buyer}" for buyer, count, error in offenders)
+        return "\n".join(lines)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+from pathlib import Path
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from .metrics import Metrics
+
+logger = logging.getLogger("FPC.AutoRefund.Audit")
+
+AUDIT_DIR = Path("storage/plugins/auto_refund_audit")
+
+
+class AuditRecord(NamedTuple):
+    ts: float
+    order_id: str
+    buyer: Optional[str]
+    action: str
+    reason: Optional[str]
+    stars: Optional[int]
+    sum: Optional[float]
+    latency_ms: float
+
+
+class AuditLog:
+    SEGMENT_SIZE = 16 * 2 ** 20
+    QUEUE_SIZE = 10000
+    BATCH_SIZE = 500
+
+    def __init__(self, metrics: Metrics, max_segments: int = 20, directory: Path = AUDIT_DIR):
+        self._metrics = metrics
+        self._max_segments = max(1, max_segments)
+        self._directory = directory
+        self._queue: queue.Queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._read_lock = threading.Lock()
+        self._reader: Optional[sqlite3.Connection] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="AutoRefund-Audit",
+            daemon=True
+        )
+        self._thread.start()
+
+    def record(
+        self,
+        order_id: str,
+        buyer: Optional[str],
+        action: str,
+        reason: Optional[str] = None,
+        stars: Optional[int] = None,
+        sum: Optional[float] = None,
+        started: Optional[float] = None
+    ) -> None:
+        latency_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        try:
+            self._queue.put_nowait(AuditRecord(time.time(), order_id, buyer, action, reason, stars, sum, latency_ms))
+        except queue.Full:
+            self._metrics.inc("audit_dropped")
+
+    def _segment_path(self, segment: int) -> Path:
+        return self._directory / f"audit-{segment:06d}.jsonl"
+
+    def _segments(self) -> List[int]:
+        return sorted(int(path.stem.split("-")[1]) for path in self._directory.glob("audit-*.jsonl"))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._directory / "index.db"), check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _open_index(self) -> sqlite3.Connection:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "segment INTEGER NOT NULL, "
+            "offset INTEGER NOT NULL, "
+            "order_id TEXT NOT NULL, "
+            "buyer TEXT, "
+            "PRIMARY KEY (segment, offset)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_buyer ON entries (buyer, segment, offset)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_order ON entries (order_id)")
+        return conn
+
+    def _open_segment(self, segment: int) -> Tuple[BinaryIO, int]:
+        f = open(self._segment_path(segment), "ab")
+        return f, f.tell()
+
+    def _drop_old_segments(self, conn: sqlite3.Connection) -> None:
+        segments = self._segments()
+        for segment in segments[:-self._max_segments]:
+            conn.execute("DELETE FROM entries WHERE segment = ?", (segment,))
+            self._segment_path(segment).unlink(missing_ok=True)
+            logger.debug(f"Dropped audit segment {segment}")
+
+    def _write_batch(
+        self,
+        conn: sqlite3.Connection,
+        f: BinaryIO,
+        segment: int,
+        offset: int,
+        batch: List[AuditRecord]
+    ) -> int:
+        rows = []
+        lines = []
+        for item in batch:
+            line = json.dumps(item._asdict(), ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+            rows.append((segment, offset, item.order_id, item.buyer))
+            lines.append(line)
+            offset += len(line)
+        f.write(b"".join(lines))
+        f.flush()
+
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+        return offset
+
+    def _drain(self, block: bool) -> List[AuditRecord]:
+        batch: List[AuditRecord] = []
+        try:
+            batch.append(self._queue.get(timeout=1.0) if block else self._queue.get_nowait())
+            while len(batch) < self.BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        try:
+            conn = self._open_index()
+            segments = self._segments()
+            segment = segments[-1] if segments else 1
+            f, size = self._open_segment(segment)
+        except Exception as e:
+            logger.error(f"Failed to open audit log: {e}")
+            return
+
+        try:
+            while True:
+                batch = self._drain(block=not self._stop.is_set())
+                if not batch:
+                    if self._stop.is_set():
+                        break
+                    continue
+
+                try:
+                    if size >= self.SEGMENT_SIZE:
+                        f.close()
+                        segment += 1
+                        f, size = self._open_segment(segment)
+                        self._drop_old_segments(conn)
+                    size = self._write_batch(conn, f, segment, size, batch)
+                except Exception as e:
+                    self._metrics.error(e)
+                    logger.error(f"Failed to write audit records: {e}")
+                    size = f.seek(0, 2)
+        finally:
+            f.close()
+            conn.close()
+
+    def _read_entries(self, locations: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        entries = []
+        files: Dict[int, BinaryIO] = {}
+        try:
+            for segment, offset in locations:
+                f = files.get(segment)
+                if f is None:
+                    try:
+                        f = files[segment] = open(self._segment_path(segment), "rb")
+                    except FileNotFoundError:
+                        continue
+                f.seek(offset)
+                line = f.readline()
+                if line.endswith(b"\n"):
+                    entries.append(json.loads(line))
+        finally:
+            for f in files.values():
+                f.close()
+        return entries
+
+    def _query(self, sql: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+        with self._read_lock:
+            if self._reader is None:
+                if not (self._directory / "index.db").exists():
+                    return []
+                self._reader = self._connect()
+            locations = self._reader.execute(sql, params).fetchall()
+        return self._read_entries(locations)
+
+    def history_for_user(self, username: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT segment, offset FROM entries WHERE buyer = ? ORDER BY segment DESC, offset DESC LIMIT ?",
+            (username, limit)
+        )
+
+    def history_for_order(self, order_id: str) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT segment, offset FROM entries WHERE order_id = ? ORDER BY segment, offset",
+            (order_id,)
+        )
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=10)
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import heapq
+import logging
+import sqlite3
+import threading
+import time
+
+from .ledger import LEDGER_PATH
+
+logger = logging.getLogger("FPC.AutoRefund.BanScheduler")
+
+
+class BanScheduler:
+    BATCH_WINDOW = 1.0
+    RETRY_DELAY = 60.0
+
+    def __init__(self, path: Path = LEDGER_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ban_expirations ("
+            "username TEXT PRIMARY KEY, "
+            "expires_at REAL NOT NULL, "
+            "reason TEXT"
+            ") WITHOUT ROWID"
+        )
+        self._cond = threading.Condition()
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._stopped = False
+        self._on_expire: Optional[Callable[[List[str]], None]] = None
+        self._thread: Optional[threading.Thread] = None
+
+        for username, expires_at in self._conn.execute("SELECT username, expires_at FROM ban_expirations"):
+            self._expiry[username] = expires_at
+            self._heap.append((expires_at, username))
+        heapq.heapify(self._heap)
+        if self._expiry:
+            logger.info(f"Loaded {len(self._expiry)} scheduled ban expirations")
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def start(self, on_expire: Callable[[List[str]], None]) -> None:
+        self._on_expire = on_expire
+        self._thread = threading.Thread(
+            target=self._run,
+            name="AutoRefund-BanScheduler",
+            daemon=True
+        )
+        self._thread.start()
+
+    def schedule(self, username: str, ttl: float, reason: str) -> None:
+        expires_at = time.time() + ttl
+        with self._cond:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ban_expirations VALUES (?, ?, ?)",
+                    (username, expires_at, reason)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist ban expiry for {username}: {e}")
+            self._expiry[username] = expires_at
+            heapq.heappush(self._heap, (expires_at, username))
+            if self._heap[0][1] == username:
+                self._cond.notify()
+
+    def cancel(self, *usernames: str) -> None:
+        with self._cond:
+            cancelled = [(name,) for name in usernames if self._expiry.pop(name, None) is not None]
+            if not cancelled:
+                return
+            try:
+                self._conn.executemany("DELETE FROM ban_expirations WHERE username = ?", cancelled)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to cancel ban expirations: {e}")
+
+    def _take_due(self) -> List[Tuple[str, float]]:
+        with self._cond:
+            while not self._stopped:
+                while self._heap and self._expiry.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+                if self._heap:
+                    timeout = self._heap[0][0] - time.time()
+                    if timeout <= 0:
+                        break
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+            if self._stopped:
+                return []
+
+            horizon = time.time() + self.BATCH_WINDOW
+            due = []
+            while self._heap and self._heap[0][0] <= horizon:
+                expires_at, username = heapq.heappop(self._heap)
+                if self._expiry.get(username) == expires_at:
+                    due.append((username, expires_at))
+            return due
+
+    def _expired(self, due: List[Tuple[str, float]]) -> None:
+        with self._cond:
+            expired = [(name,) for name, expires_at in due if self._expiry.get(name) == expires_at]
+            for (name,) in expired:
+                del self._expiry[name]
+            try:
+                self._conn.executemany("DELETE FROM ban_expirations WHERE username = ?", expired)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to remove expired bans: {e}")
+
+    def _retry(self, due: List[Tuple[str, float]]) -> None:
+        retry_at = time.time() + self.RETRY_DELAY
+        with self._cond:
+            for name, expires_at in due:
+                if self._expiry.get(name) == expires_at:
+                    self._expiry[name] = retry_at
+                    heapq.heappush(self._heap, (retry_at, name))
+
+    def _run(self) -> None:
+        while True:
+            due = self._take_due()
+            if not due:
+                return
+
+            try:
+                self._on_expire([name for name, _ in due])
+            except Exception as e:
+                logger.error(f"Failed to expire bans, retrying in {self.RETRY_DELAY:.0f}s: {e}")
+                self._retry(due)
+                continue
+            self._expired(due)
+            logger.info(f"{len(due)} temporary bans expired")
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._cond:
+            self._conn.close()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional
+from itertools import islice
+import io
+import re
+
+USERNAME_RE = re.compile(r"^[\w.\-]{1,64}$")
+HEADER_NAMES = frozenset({"username", "user", "login", "name", "ник"})
+SEPARATORS = re.compile(r"[,;\t]")
+
+
+class ImportStats:
+    __slots__ = ("lines", "valid", "invalid", "duplicates", "added")
+
+    def __init__(self):
+        self.lines = 0
+        self.valid = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.added = 0
+
+
+def iter_usernames(
+    stream: BinaryIO,
+    stats: ImportStats,
+    on_progress: Optional[Callable[[ImportStats], None]] = None,
+    progress_every: int = 10000
+) -> Iterator[str]:
+    seen = set()
+    for line in io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace"):
+        stats.lines += 1
+        if on_progress is not None and stats.lines % progress_every == 0:
+            on_progress(stats)
+
+        name = SEPARATORS.split(line, 1)[0].strip().strip("\"'").lstrip("@")
+        if not name or name.lower() in HEADER_NAMES and stats.lines == 1:
+            continue
+        if not USERNAME_RE.match(name):
+            stats.invalid += 1
+            continue
+        if name in seen:
+            stats.duplicates += 1
+            continue
+
+        seen.add(name)
+        stats.valid += 1
+        yield name
+
+
+def chunked(names: Iterable[str], size: int) -> Iterator[List[str]]:
+    names = iter(names)
+    while True:
+        chunk = list(islice(names, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_usernames(names: Iterable[str], stream: BinaryIO, chunk_size: int = 5000) -> int:
+    count = 0
+    chunk = []
+    for name in names:
+        chunk.append(name)
+        if len(chunk) >= chunk_size:
+            stream.write(("\n".join(chunk) + "\n").encode())
+            count += len(chunk)
+            chunk.clear()
+    if chunk:
+        stream.write(("\n".join(chunk) + "\n").encode())
+        count += len(chunk)
+    return count
@@ -1,35 +1,387 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Set, TextIO, Tuple
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
 import logging
+import threading
+import time
 
 if TYPE_CHECKING:
     from cardinal import Cardinal
 
 from Utils import cardinal_tools
 
+from .ban_scheduler import BanScheduler
+from .shared_blacklist import SharedBlacklist
+from .sorted_names import SortedNames
+
 logger = logging.getLogger("FPC.AutoRefund.Blacklist")
 
+JOURNAL_PATH = Path("storage/plugins/auto_refund_blacklist.journal")
+CACHE_PATH = Path("storage/cache/blacklist.json")
+
+
+class _TrackedList(list):
+    __slots__ = ("version",)
+
+    def __init__(self, *args: Any):
+        super().__init__(*args)
+        self.version = 0
+
+
+def _tracked(name: str) -> Callable[..., Any]:
+    method = getattr(list, name)
+
+    def wrapper(self: _TrackedList, *args: Any, **kwargs: Any) -> Any:
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "append", "extend", "insert", "remove", "pop", "clear", "sort", "reverse",
+    "__setitem__", "__delitem__", "__iadd__", "__imul__",
+):
+    setattr(_TrackedList, _name, _tracked(_name))
+
 
 class BlacklistManager:
-    def __init__(self, cardinal: Cardinal):
+    COMPACT_THRESHOLD = 500
+    COMPACT_INTERVAL = 300.0
+
+    def __init__(
+        self,
+        cardinal: Cardinal,
+        journal_path: Path = JOURNAL_PATH,
+        cache_path: Path = CACHE_PATH,
+        shared: Optional[SharedBlacklist] = None,
+        scheduler: Optional[BanScheduler] = None
+    ):
         self._cardinal = cardinal
+        self._shared = shared
+        self._scheduler = scheduler
+        self._journal_path = journal_path
+        self._cache_path = cache_path
+        self._rotated_path = journal_path.with_suffix(journal_path.suffix + ".old")
+        self._lock = threading.RLock()
+        self._index: Set[str] = set()
+        self._sorted: Optional[SortedNames] = None
+        self._source: Optional[_TrackedList] = None
+        self._version = -1
+        self._journal: Optional[TextIO] = None
+        self._journal_entries = 0
+        self._last_compact = time.monotonic()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
 
-    def is_blacklisted(self, username: str) -> bool:
-        return username in self._cardinal.blacklist
+        self._replay_journal()
+        self._rebuild_index()
+
+        self._compactor = threading.Thread(
+            target=self._compact_loop,
+            name="AutoRefund-BlacklistCompactor",
+            daemon=True
+        )
+        self._compactor.start()
+
+        if shared is not None:
+            shared.start(self._merge_shared, self._apply_shared)
+        if scheduler is not None:
+            scheduler.start(self._expire)
 
-    def add_to_blacklist(self, username: str) -> None:
-        if username in self._cardinal.blacklist:
-            logger.debug(f"User {username} already in blacklist")
+    def _rebuild_index(self) -> None:
+        with self._lock:
+            source = self._cardinal.blacklist
+            if not isinstance(source, _TrackedList):
+                source = _TrackedList(source)
+                self._cardinal.blacklist = source
+            self._index = set(source)
+            self._sorted = None
+            self._source = source
+            self._version = source.version
+
+    def _is_synced(self) -> bool:
+        source = self._cardinal.blacklist
+        return source is self._source and source.version == self._version
+
+    def _ensure_synced(self) -> None:
+        if self._is_synced():
             return
+        with self._lock:
+            if self._is_synced():
+                return
+            logger.debug("Blacklist changed outside of plugin, rebuilding index")
+            previous = self._index
+            self._rebuild_index()
+            added = self._index - previous
+            removed = previous - self._index
+            if added:
+                self._append_journal("+", *added)
+            if removed:
+                self._append_journal("-", *removed)
+                if self._scheduler is not None:
+                    self._scheduler.cancel(*removed)
 
-        self._cardinal.blacklist.append(username)
-        cardinal_tools.cache_blacklist(self._cardinal.blacklist)
-        logger.info(f"Added {username} to blacklist")
+    def _journal_is_newer(self) -> bool:
+        written = [path.stat().st_mtime for path in (self._rotated_path, self._journal_path) if path.exists()]
+        if not written:
+            return False
+        try:
+            return max(written) > self._cache_path.stat().st_mtime
+        except FileNotFoundError:
+            return True
 
-    def remove_from_blacklist(self, username: str) -> None:
-        if username not in self._cardinal.blacklist:
+    def _replay_journal(self) -> None:
+        if not self._journal_is_newer():
+            for path in (self._rotated_path, self._journal_path):
+                path.unlink(missing_ok=True)
             return
 
-        self._cardinal.blacklist.remove(username)
-        cardinal_tools.cache_blacklist(self._cardinal.blacklist)
-        logger.info(f"Removed {username} from blacklist")
\ No newline at end of file
+        entries = 0
+        names: Dict[str, None] = dict.fromkeys(self._cardinal.blacklist)
+
+        for path in (self._rotated_path, self._journal_path):
+            if not path.exists():
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.rstrip("\n")
+                        if len(line) < 2:
+                            continue
+                        op, username = line[0], line[1:]
+                        if op == "+":
+                            names[username] = None
+                        elif op == "-":
+                            names.pop(username, None)
+                        entries += 1
+            except Exception as e:
+                logger.error(f"Failed to replay blacklist journal {path}: {e}")
+
+        if entries:
+            self._cardinal.blacklist[:] = list(names)
+            self._journal_entries = entries
+            logger.info(f"Replayed {entries} blacklist journal entries")
+
+    def _append_journal(self, op: str, *usernames: str) -> None:
+        try:
+            if self._journal is None:
+                self._journal_path.parent.mkdir(parents=True, exist_ok=True)
+                self._journal = open(self._journal_path, "a", encoding="utf-8")
+            self._journal.write("".join(f"{op}{username}\n" for username in usernames))
+            self._journal.flush()
+            self._journal_entries += len(usernames)
+        except Exception as e:
+            logger.error(f"Failed to write blacklist journal: {e}")
+            return
+
+        if self._journal_entries >= self.COMPACT_THRESHOLD:
+            self._wakeup.set()
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _rotate_journal(self) -> None:
+        self._close_journal()
+        if not self._journal_path.exists():
+            return
+        if self._rotated_path.exists():
+            with open(self._journal_path, "r", encoding="utf-8") as src, \
+                    open(self._rotated_path, "a", encoding="utf-8") as dst:
+                dst.write(src.read())
+            self._journal_path.unlink()
+        else:
+            self._journal_path.replace(self._rotated_path)
+
+    def compact(self) -> None:
+        with self._lock:
+            self._last_compact = time.monotonic()
+            if not self._journal_entries and not self._rotated_path.exists():
+                return
+            snapshot = list(self._cardinal.blacklist)
+            try:
+                self._rotate_journal()
+            except Exception as e:
+                logger.error(f"Failed to rotate blacklist journal: {e}")
+                return
+            self._journal_entries = 0
+
+        try:
+            cardinal_tools.cache_blacklist(snapshot)
+            self._rotated_path.unlink(missing_ok=True)
+            logger.debug(f"Blacklist compacted ({len(snapshot)} users)")
+        except Exception as e:
+            logger.error(f"Failed to compact blacklist: {e}")
+
+    def _compact_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.COMPACT_INTERVAL)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            due = time.monotonic() - self._last_compact >= self.COMPACT_INTERVAL
+            if self._journal_entries >= self.COMPACT_THRESHOLD or (self._journal_entries and due):
+                self.compact()
+
+    def _merge_shared(self, members: Dict[str, bool]) -> None:
+        with self._lock:
+            self._ensure_synced()
+            local_only = [name for name in self._index if not members.get(name)]
+            added = self._add_batch(name for name, active in members.items() if active)
+        if added:
+            logger.info(f"Shared blacklist bootstrap: +{len(added)} users from the shared store")
+        if local_only:
+            logger.info(
+                f"Shared blacklist bootstrap: keeping {len(local_only)} local users "
+                "missing or unbanned in the shared store"
+            )
+            self._shared.publish_many("+", local_only)
+
+    def _apply_shared(self, changes: List[Tuple[str, str]]) -> None:
+        added = removed = 0
+        with self._lock:
+            self._ensure_synced()
+            for op, group in groupby(changes, key=itemgetter(0)):
+                names = [username for _, username in group]
+                if op == "+":
+                    added += len(self._add_batch(names))
+                elif op == "-":
+                    dropped = self._remove_batch(names)
+                    if dropped and self._scheduler is not None:
+                        self._scheduler.cancel(*dropped)
+                    removed += len(dropped)
+        if added or removed:
+            logger.info(f"Shared blacklist sync: +{added} -{removed}")
+
+    def _expire(self, usernames: List[str]) -> None:
+        with self._lock:
+            self._ensure_synced()
+            removed = self._remove_batch(usernames)
+        if removed and self._shared is not None:
+            self._shared.publish_many("-", removed)
+
+    def close(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.close()
+        if self._shared is not None:
+            self._shared.close()
+        self._stop.set()
+        self._wakeup.set()
+        self._compactor.join(timeout=5)
+        self.compact()
+        with self._lock:
+            self._close_journal()
+
+    def is_blacklisted(self, username: str) -> bool:
+        self._ensure_synced()
+        return username in self._index
+
+    def _add_local(self, username: str) -> bool:
+        if username in self._index:
+            return False
+        list.append(self._source, username)
+        self._index.add(username)
+        if self._sorted is not None:
+            self._sorted.add(username)
+        self._append_journal("+", username)
+        return True
+
+    def _remove_local(self, username: str) -> bool:
+        if username not in self._index:
+            return False
+        list.remove(self._source, username)
+        self._index.discard(username)
+        if self._sorted is not None:
+            self._sorted.discard(username)
+        self._append_journal("-", username)
+        return True
+
+    def add_to_blacklist(self, username: str, ttl: float = 0.0, reason: str = "") -> None:
+        with self._lock:
+            self._ensure_synced()
+            if not self._add_local(username):
+                logger.debug(f"User {username} already in blacklist")
+                return
+            if ttl > 0 and self._scheduler is not None:
+                self._scheduler.schedule(username, ttl, reason)
+        if self._shared is not None:
+            self._shared.publish("+", username)
+        if ttl > 0:
+            logger.info(f"Added {username} to blacklist for {ttl:.0f}s ({reason})")
+        else:
+            logger.info(f"Added {username} to blacklist")
+
+    def remove_from_blacklist(self, username: str) -> None:
+        with self._lock:
+            self._ensure_synced()
+            if not self._remove_local(username):
+                return
+            if self._scheduler is not None:
+                self._scheduler.cancel(username)
+        if self._shared is not None:
+            self._shared.publish("-", username)
+        logger.info(f"Removed {username} from blacklist")
+
+    def _add_batch(self, usernames: Iterable[str]) -> List[str]:
+        added = list(dict.fromkeys(name for name in usernames if name not in self._index))
+        if added:
+            list.extend(self._source, added)
+            self._index.update(added)
+            if self._sorted is not None:
+                self._sorted.update(added)
+            self._append_journal("+", *added)
+        return added
+
+    def _remove_batch(self, usernames: Iterable[str]) -> Set[str]:
+        removed = {name for name in usernames if name in self._index}
+        if removed:
+            list.__setitem__(self._source, slice(None), [name for name in self._source if name not in removed])
+            self._index.difference_update(removed)
+            if self._sorted is not None:
+                self._sorted.difference_update(removed)
+            self._append_journal("-", *removed)
+        return removed
+
+    def add_many(self, usernames: Iterable[str]) -> int:
+        with self._lock:
+            self._ensure_synced()
+            added = self._add_batch(usernames)
+        if not added:
+            return 0
+        if self._shared is not None:
+            self._shared.publish_many("+", added)
+        logger.info(f"Added {len(added)} users to blacklist")
+        return len(added)
+
+    def remove_many(self, usernames: Iterable[str]) -> int:
+        with self._lock:
+            self._ensure_synced()
+            removed = self._remove_batch(usernames)
+            if removed and self._scheduler is not None:
+                self._scheduler.cancel(*removed)
+        if not removed:
+            return 0
+        if self._shared is not None:
+            self._shared.publish_many("-", removed)
+        logger.info(f"Removed {len(removed)} users from blacklist")
+        return len(removed)
+
+    def expiring(self) -> int:
+        return len(self._scheduler) if self._scheduler is not None else 0
+
+    def browse(self, prefix: str = "", offset: int = 0, limit: int = 10) -> Tuple[int, List[str]]:
+        with self._lock:
+            self._ensure_synced()
+            if self._sorted is None:
+                self._sorted = SortedNames(self._index)
+            return self._sorted.page(prefix, offset, limit)
+
+    def snapshot(self) -> List[str]:
+        with self._lock:
+            self._ensure_synced()
+            return list(self._cardinal.blacklist)
\ No newline at end of file
@@ -0,0 +1,34 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+
+class ChatCache:
+    def __init__(self, capacity: int = 10000, ttl: float = 86400.0):
+        self._capacity = capacity
+        self._ttl = ttl
+        self._entries: OrderedDict[str, Tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, username: str, chat_id: int) -> None:
+        with self._lock:
+            self._entries[username] = (chat_id, time.monotonic() + self._ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
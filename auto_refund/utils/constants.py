@@ -29,4 +29,45 @@ class UIConstants:
 class CallbackData:
     PRICE_CHANGE: str = "AR_PRICE_CHANGE"
     TEXT_CHANGE: str = "AR_TEXT_CHANGE"
-    SWITCH: str = "AR_SWITCH"
\ No newline at end of file
+    SWITCH: str = "AR_SWITCH"
+    STATS: str = "AR_STATS"
+    ANALYTICS: str = "AR_ANALYTICS"
+    RECONCILE: str = "AR_RECONCILE"
+    BLACKLIST_IMPORT: str = "AR_BL_IMPORT"
+    BLACKLIST_EXPORT: str = "AR_BL_EXPORT"
+    BLACKLIST_BROWSE: str = "AR_BL_BROWSE"
+    BLACKLIST_SEARCH: str = "AR_BL_SEARCH"
+    BLACKLIST_UNBAN: str = "AR_BL_UNBAN"
+
+
+@dataclass(frozen=True)
+class LedgerActions:
+    REFUNDED: str = "refunded"
+    BANNED: str = "banned"
+
+
+@dataclass(frozen=True)
+class AuditActions:
+    REFUNDED: str = "refunded"
+    BANNED: str = "banned"
+    SKIPPED: str = "skipped"
+    QUEUED: str = "queued"
+
+
+@dataclass(frozen=True)
+class OutboxKinds:
+    REFUND: str = "refund"
+    MESSAGE: str = "message"
+
+
+@dataclass(frozen=True)
+class OutboxResults:
+    DONE: str = "done"
+    QUEUED: str = "queued"
+    DUPLICATE: str = "duplicate"
+
+
+@dataclass(frozen=True)
+class RefundSources:
+    ORDER: str = "order"
+    FEEDBACK: str = "feedback"
@@ -0,0 +1,157 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
+import logging
+import random
+import threading
+import time
+
+if TYPE_CHECKING:
+    from FunPayAPI import Account
+
+from .metrics import Metrics
+from .rate_limiter import TokenBucket
+from .trace_recorder import TraceRecorder
+
+logger = logging.getLogger("FPC.AutoRefund.FunPayClient")
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_in: float):
+        super().__init__(f"FunPay API circuit is open, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, cooldown: float):
+        self._threshold = max(1, threshold)
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            retry_in = self._opened_at + self._cooldown - time.monotonic()
+            if self.state == self.OPEN and retry_in <= 0:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+
+            raise CircuitOpenError(max(0.0, retry_in))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("FunPay API recovered, circuit closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self._threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                return opened
+            return False
+
+
+class FunPayClient:
+    def __init__(
+        self,
+        account: Account,
+        metrics: Metrics,
+        rate: float,
+        burst: int,
+        retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        breaker_threshold: int,
+        breaker_cooldown: float,
+        recorder: Optional[TraceRecorder] = None
+    ):
+        self._account = account
+        self._metrics = metrics
+        self._bucket = TokenBucket(rate, burst)
+        self._retries = retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self._recorder = recorder
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        status_code = getattr(exc, "status_code", None)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        return isinstance(exc, OSError)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self._backoff_max, self._backoff_base * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _call(self, stage: str, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self._bucket.acquire()
+
+            try:
+                with self._metrics.timed(stage):
+                    result = method(*args, **kwargs)
+            except Exception as e:
+                if self._recorder is not None:
+                    self._recorder.call(stage, [*args, *kwargs.values()], error=e)
+                if not self.is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+
+                if self.breaker.record_failure():
+                    self._metrics.inc("circuit_opened")
+                    logger.warning(f"FunPay API is failing, pausing calls: {e}")
+
+                if attempt >= self._retries:
+                    raise
+
+                delay = self._backoff(attempt)
+                attempt += 1
+                self._metrics.inc("api_retries")
+                logger.debug(f"{stage} failed ({e}), retry {attempt}/{self._retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if self._recorder is not None:
+                self._recorder.call(stage, [*args, *kwargs.values()], result)
+            self.breaker.record_success()
+            return result
+
+    def get_order(self, order_id: str) -> Any:
+        return self._call("get_order", self._account.get_order, order_id)
+
+    def refund(self, order_id: str) -> None:
+        self._call("refund", self._account.refund, order_id)
+
+    def send_message(self, chat_id: Any, text: str) -> Any:
+        return self._call("send_message", self._account.send_message, chat_id, text)
+
+    def get_chat_by_name(self, username: str) -> Any:
+        return self._call("get_chat_by_name", self._account.get_chat_by_name, username)
+
+    def get_sales(self, start_from: Optional[str] = None) -> Tuple[Optional[str], List[Any]]:
+        result = self._call("get_sales", self._account.get_sales, start_from=start_from)
+        return result[0], result[1]
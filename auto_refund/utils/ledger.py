@@ -0,0 +1,54 @@
+from __future__ import annotations
+from typing import Optional
+from pathlib import Path
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("FPC.AutoRefund.Ledger")
+
+LEDGER_PATH = Path("storage/plugins/auto_refund.db")
+
+
+class RefundLedger:
+    def __init__(self, path: Path = LEDGER_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_orders ("
+            "order_id TEXT PRIMARY KEY, "
+            "action TEXT NOT NULL, "
+            "buyer_username TEXT, "
+            "processed_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def get(self, order_id: str) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT action FROM processed_orders WHERE order_id = ?",
+                    (order_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read ledger for order {order_id}: {e}")
+            return None
+        return row[0] if row else None
+
+    def record(self, order_id: str, action: str, buyer_username: Optional[str] = None) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO processed_orders VALUES (?, ?, ?, ?)",
+                    (order_id, action, buyer_username, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record {action} for order {order_id}: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
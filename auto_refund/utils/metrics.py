@@ -0,0 +1,184 @@
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("FPC.AutoRefund.Metrics")
+
+METRICS_PATH = Path("storage/plugins/auto_refund_metrics.prom")
+
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._started = time.time()
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def error(self, exc: BaseException) -> None:
+        name = type(exc).__name__
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def register_gauge(self, name: str, getter: Callable[[], float]) -> None:
+        self._gauges[name] = getter
+
+    def _gauge_values(self) -> Dict[str, float]:
+        values = {}
+        for name, getter in self._gauges.items():
+            try:
+                values[name] = float(getter())
+            except Exception as e:
+                logger.debug(f"Gauge {name} failed: {e}")
+        return values
+
+    def render_text(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            errors = dict(self._errors)
+            stages = {name: (h.count, h.total, h.quantile(0.5), h.quantile(0.99))
+                      for name, h in self._histograms.items()}
+        gauges = self._gauge_values()
+
+        uptime = int(time.time() - self._started)
+        lines = [f"📊 Статистика автовозврата (аптайм {uptime // 3600}ч {uptime % 3600 // 60}м)", ""]
+        for name in sorted(counters):
+            lines.append(f"{name}: {counters[name]}")
+        for name in sorted(gauges):
+            lines.append(f"{name}: {gauges[name]:g}")
+
+        if stages:
+            lines.extend(["", "⏱ Задержки (вызовов / среднее / p50 / p99):"])
+            for name in sorted(stages):
+                count, total, p50, p99 = stages[name]
+                avg = total / count if count else 0.0
+                lines.append(f"{name}: {count} / {avg * 1000:.0f}мс / ≤{p50 * 1000:g}мс / ≤{p99 * 1000:g}мс")
+
+        if errors:
+            lines.extend(["", "⚠️ Ошибки:"])
+            for name in sorted(errors):
+                lines.append(f"{name}: {errors[name]}")
+
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            errors = dict(self._errors)
+            histograms = {name: (list(h.counts), h.total, h.count) for name, h in self._histograms.items()}
+        gauges = self._gauge_values()
+
+        lines = ["# TYPE auto_refund_events_total counter"]
+        for name in sorted(counters):
+            lines.append(f'auto_refund_events_total{{event="{name}"}} {counters[name]}')
+
+        lines.append("# TYPE auto_refund_errors_total counter")
+        for name in sorted(errors):
+            lines.append(f'auto_refund_errors_total{{type="{name}"}} {errors[name]}')
+
+        for name in sorted(gauges):
+            lines.append(f"# TYPE auto_refund_{name} gauge")
+            lines.append(f"auto_refund_{name} {gauges[name]:g}")
+
+        lines.append("# TYPE auto_refund_stage_seconds histogram")
+        for name in sorted(histograms):
+            counts, total, count = histograms[name]
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'auto_refund_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'auto_refund_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'auto_refund_stage_seconds_count{{stage="{name}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    def __init__(self, metrics: Metrics, interval: float, path: Path = METRICS_PATH):
+        self._metrics = metrics
+        self._interval = interval
+        self._path = path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if interval > 0:
+            self._thread = threading.Thread(
+                target=self._run,
+                name="AutoRefund-Metrics",
+                daemon=True
+            )
+            self._thread.start()
+
+    def export(self) -> None:
+        tmp_path = self._path.with_suffix(self._path.suffix + ".tmp")
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(self._metrics.render_prometheus(), encoding="utf-8")
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            logger.error(f"Failed to export metrics: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.export()
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.export()
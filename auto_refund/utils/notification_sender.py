@@ -1,46 +1,87 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List
 import logging
+import time
 
 if TYPE_CHECKING:
     from cardinal import Cardinal
 
 from ..core.config import RefundConfig
+from .metrics import Metrics
+from .notification_sinks import (
+    KIND_ALERT,
+    KIND_BLACKLIST,
+    KIND_ORDER_REFUND,
+    KIND_REFUND,
+    Notification,
+    NotificationSink,
+    TelegramSink,
+    WebhookSink,
+)
 
 logger = logging.getLogger("FPC.AutoRefund.Notifications")
 
 
 class NotificationSender:
-    def __init__(self, cardinal: Cardinal, config: RefundConfig):
-        self._cardinal = cardinal
-        self._config = config
+    def __init__(self, cardinal: Cardinal, config: RefundConfig, metrics: Metrics):
+        settings = config.snapshot
+        queue_size = settings.notification_queue_size
+        timeout = settings.notification_timeout
 
-    def _send_telegram_notification(self, message: str) -> None:
-        if not self._config.refund_notification:
-            return
+        self._stopped = False
+        self._sinks: List[NotificationSink] = [TelegramSink(cardinal, config, metrics, None, queue_size, timeout)]
+        self._sinks.extend(
+            TelegramSink(cardinal, config, metrics, int(chat_id), queue_size, timeout)
+            for chat_id in settings.notification_chat_ids
+        )
+        for webhook in settings.notification_webhooks:
+            try:
+                self._sinks.append(WebhookSink.from_dict(webhook, metrics, queue_size))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logger.error(f"Invalid notification webhook {webhook}: {e}")
 
-        chat_id = self._config.refund_notification_chat_id
-        if chat_id == 0:
-            logger.warning("Notification chat_id not configured")
+    def _enqueue(self, kind: str, username: str, text: str) -> None:
+        if self._stopped:
+            logger.warning(f"Notification sender stopped, dropping: {text}")
             return
 
-        try:
-            self._cardinal.telegram.bot.send_message(chat_id, message)
-            logger.debug(f"Notification sent: {message}")
-        except Exception as e:
-            logger.error(f"Failed to send notification: {e}")
+        notification = Notification(kind, username, text, time.monotonic(), time.time())
+        for sink in self._sinks:
+            if sink.enabled():
+                sink.submit(notification)
+
+    def pending(self) -> int:
+        return sum(sink.pending() for sink in self._sinks)
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._stopped = True
+        for sink in self._sinks:
+            sink.stop()
+        deadline = time.monotonic() + timeout
+        for sink in self._sinks:
+            sink.join(max(0.0, deadline - time.monotonic()))
 
     def send_blacklist_notification(self, username: str) -> None:
         message = f"[AutoRefund] Пользователь {username} добавлен в ЧС"
-        self._send_telegram_notification(message)
+        self._enqueue(KIND_BLACKLIST, username, message)
 
     def send_refund_notification(self, username: str) -> None:
         message = f"[AutoRefund]\n<b>Возврат выполнен.</b>\n<i>Пользователь {username} добавлен в ЧС</i>"
-        self._send_telegram_notification(message)
+        self._enqueue(KIND_REFUND, username, message)
+
+    def send_refund_queued_notification(self, username: str) -> None:
+        message = (
+            f"[AutoRefund]\n<b>Возврат поставлен в очередь.</b>\n"
+            f"<i>Пользователь {username} добавлен в ЧС, возврат будет выполнен автоматически</i>"
+        )
+        self._enqueue(KIND_REFUND, username, message)
 
     def send_order_refund_notification(self, username: str) -> None:
         message = (
             f"[AutoRefund] Пользователь {username} из ЧС попытался оформить заказ. "
             "Выполнен автоматический возврат"
         )
-        self._send_telegram_notification(message)
\ No newline at end of file
+        self._enqueue(KIND_ORDER_REFUND, username, message)
+
+    def send_alert(self, text: str) -> None:
+        self._enqueue(KIND_ALERT, "", text)
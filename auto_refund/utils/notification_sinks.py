@@ -0,0 +1,285 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
+from abc import ABC, abstractmethod
+from collections import deque
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected
+from urllib.parse import urlsplit
+import json
+import logging
+import threading
+import time
+
+if TYPE_CHECKING:
+    from cardinal import Cardinal
+
+from ..core.config import RefundConfig
+from .rate_limiter import TokenBucket
+from .metrics import Metrics
+
+logger = logging.getLogger("FPC.AutoRefund.Notifications")
+
+KIND_BLACKLIST = "blacklist"
+KIND_REFUND = "refund"
+KIND_ORDER_REFUND = "order_refund"
+KIND_ALERT = "alert"
+
+
+class Notification(NamedTuple):
+    kind: str
+    username: str
+    text: str
+    created_at: float
+    ts: float
+
+
+class NotificationSink(ABC):
+    STAGE = "notification"
+
+    def __init__(self, name: str, metrics: Metrics, queue_size: int, timeout: float, batch_size: int = 1):
+        self.name = name
+        self._metrics = metrics
+        self._queue_size = queue_size
+        self._timeout = timeout
+        self._batch_size = batch_size
+        self._queue: deque[Notification] = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._overflowing = False
+        self._worker: Optional[threading.Thread] = None
+
+    def enabled(self) -> bool:
+        return True
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        self._worker = threading.Thread(
+            target=self._run,
+            name=f"AutoRefund-Notify-{self.name}",
+            daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, notification: Notification) -> None:
+        with self._cond:
+            if self._stopped:
+                return
+            if len(self._queue) >= self._queue_size:
+                self._metrics.inc("notifications_dropped")
+                if not self._overflowing:
+                    self._overflowing = True
+                    logger.warning(f"Sink {self.name} queue is full, dropping notifications")
+                return
+            self._overflowing = False
+            self._ensure_worker()
+            self._queue.append(notification)
+            self._cond.notify()
+
+    def _wait_for_items(self) -> bool:
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            return bool(self._queue)
+
+    def _before_batch(self) -> None:
+        pass
+
+    def _take_batch(self) -> List[Notification]:
+        with self._cond:
+            count = min(self._batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    @abstractmethod
+    def _deliver(self, batch: List[Notification]) -> None:
+        ...
+
+    def _run(self) -> None:
+        while self._wait_for_items():
+            self._before_batch()
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            try:
+                with self._metrics.timed(self.STAGE):
+                    self._deliver(batch)
+                self._metrics.inc("notifications_sent", len(batch))
+            except Exception as e:
+                self._metrics.error(e)
+                logger.error(f"Sink {self.name} failed to deliver {len(batch)} notifications: {e}")
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def join(self, timeout: float) -> None:
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+
+
+class TelegramSink(NotificationSink):
+    STAGE = "telegram"
+    DIGEST_NAMES_LIMIT = 50
+
+    def __init__(
+        self,
+        cardinal: Cardinal,
+        config: RefundConfig,
+        metrics: Metrics,
+        chat_id: Optional[int] = None,
+        queue_size: int = 1000,
+        timeout: float = 10.0
+    ):
+        super().__init__(f"telegram-{chat_id}" if chat_id else "telegram", metrics, queue_size, timeout)
+        self._cardinal = cardinal
+        self._config = config
+        self._chat_id = chat_id
+        self._bucket = TokenBucket(config.snapshot.notification_rate, config.snapshot.notification_burst)
+
+    def enabled(self) -> bool:
+        return self._config.snapshot.refund_notification
+
+    def _before_batch(self) -> None:
+        while not self._bucket.try_acquire():
+            with self._cond:
+                if self._stopped:
+                    return
+                self._cond.wait(self._bucket.wait_time())
+
+    def _take_batch(self) -> List[Notification]:
+        with self._cond:
+            if len(self._queue) > self._config.snapshot.notification_digest_threshold or self._stopped:
+                batch = list(self._queue)
+                self._queue.clear()
+                return batch
+            return [self._queue.popleft()] if self._queue else []
+
+    def _format_digest(self, batch: List[Notification]) -> str:
+        refunds = sum(1 for n in batch if n.kind in (KIND_REFUND, KIND_ORDER_REFUND))
+        bans = sum(1 for n in batch if n.kind in (KIND_REFUND, KIND_BLACKLIST))
+        window = max(1, int(time.monotonic() - batch[0].created_at))
+
+        names = list(dict.fromkeys(n.username for n in batch if n.username))
+        shown = ", ".join(names[:self.DIGEST_NAMES_LIMIT])
+        if len(names) > self.DIGEST_NAMES_LIMIT:
+            shown += f" и ещё {len(names) - self.DIGEST_NAMES_LIMIT}"
+
+        alerts = [n.text for n in batch if n.kind == KIND_ALERT]
+        return "\n".join([
+            *alerts,
+            f"[AutoRefund] За последние {window}с: {refunds} возвратов, {bans} добавлений в ЧС",
+            f"<i>{shown}</i>",
+        ])
+
+    def _deliver(self, batch: List[Notification]) -> None:
+        chat_id = self._chat_id or self._config.snapshot.refund_notification_chat_id
+        if chat_id == 0:
+            logger.warning("Notification chat_id not configured")
+            return
+
+        message = batch[0].text if len(batch) == 1 else self._format_digest(batch)
+        self._cardinal.telegram.bot.send_message(chat_id, message, timeout=int(self._timeout))
+        logger.debug(f"Notification sent to {chat_id}: {message}")
+
+
+class WebhookError(Exception):
+    def __init__(self, url: str, status_code: int):
+        super().__init__(f"{url} responded with HTTP {status_code}")
+        self.status_code = status_code
+
+
+class _PersistentConnection:
+    STALE_ERRORS = (RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unsupported webhook url: {url}")
+        self._factory = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._timeout = timeout
+        self._conn: Optional[HTTPConnection] = None
+
+    def post(self, body: bytes, headers: Dict[str, str]) -> int:
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._factory(self._host, self._port, timeout=self._timeout)
+            try:
+                self._conn.request("POST", self._path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                response.read()
+                if response.will_close:
+                    self.close()
+                return response.status
+            except self.STALE_ERRORS:
+                self.close()
+                if attempt:
+                    raise
+            except (OSError, HTTPException):
+                self.close()
+                raise
+        return 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class WebhookSink(NotificationSink):
+    STAGE = "webhook"
+
+    def __init__(
+        self,
+        url: str,
+        metrics: Metrics,
+        queue_size: int = 1000,
+        timeout: float = 5.0,
+        batch_size: int = 50,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        super().__init__(f"webhook-{urlsplit(url).hostname}", metrics, queue_size, timeout, batch_size)
+        self._url = url
+        self._connection = _PersistentConnection(url, timeout)
+        self._headers = {
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+            **(headers or {}),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], metrics: Metrics, queue_size: int) -> WebhookSink:
+        return cls(
+            data["url"],
+            metrics,
+            queue_size=queue_size,
+            timeout=float(data.get("timeout", 5.0)),
+            batch_size=max(1, int(data.get("batch_size", 50))),
+            headers={str(k): str(v) for k, v in data.get("headers", {}).items()}
+        )
+
+    def _deliver(self, batch: List[Notification]) -> None:
+        body = json.dumps({
+            "events": [
+                {"kind": n.kind, "username": n.username, "text": n.text, "ts": n.ts}
+                for n in batch
+            ]
+        }, ensure_ascii=False).encode()
+
+        status = self._connection.post(body, self._headers)
+        if status >= 400:
+            raise WebhookError(self._url, status)
+        logger.debug(f"Webhook {self.name} accepted {len(batch)} notifications")
+
+    def _run(self) -> None:
+        try:
+            super()._run()
+        finally:
+            self._connection.close()
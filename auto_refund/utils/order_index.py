@@ -0,0 +1,56 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import threading
+
+
+class OrderSummary:
+    __slots__ = ("id", "buyer_username", "sum", "subcategory", "currency")
+
+    def __init__(self, id: str, buyer_username: str, sum: float, subcategory: Any, currency: Any):
+        self.id = id
+        self.buyer_username = buyer_username
+        self.sum = sum
+        self.subcategory = subcategory
+        self.currency = currency
+
+
+class OrderIndex:
+    def __init__(self, capacity: int = 50000):
+        self._capacity = max(1, capacity)
+        self._ring: List[Optional[OrderSummary]] = [None] * self._capacity
+        self._slots: Dict[str, int] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def put(self, order: Any) -> None:
+        summary = OrderSummary(
+            str(order.id),
+            order.buyer_username,
+            order.sum,
+            getattr(order, "subcategory", None),
+            getattr(order, "currency", None)
+        )
+        with self._lock:
+            slot = self._slots.get(summary.id)
+            if slot is None:
+                slot = self._next
+                evicted = self._ring[slot]
+                if evicted is not None:
+                    del self._slots[evicted.id]
+                self._slots[summary.id] = slot
+                self._next = (slot + 1) % self._capacity
+            self._ring[slot] = summary
+
+    def get(self, order_id: str) -> Optional[OrderSummary]:
+        with self._lock:
+            slot = self._slots.get(order_id)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._ring[slot]
@@ -0,0 +1,307 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from FunPayAPI.types import OrderStatuses
+
+from .constants import LedgerActions, OutboxKinds, OutboxResults
+from .funpay_client import CircuitOpenError, FunPayClient
+from .ledger import LEDGER_PATH, RefundLedger
+from .metrics import Metrics
+from .rate_limiter import TokenBucket
+
+logger = logging.getLogger("FPC.AutoRefund.Outbox")
+
+PENDING = "pending"
+FAILED = "failed"
+
+Entry = Tuple[int, str, Dict[str, Any], int]
+Listener = Callable[[Dict[str, Any]], None]
+
+
+class Outbox:
+    LEASE = 600.0
+
+    def __init__(
+        self,
+        client: FunPayClient,
+        ledger: RefundLedger,
+        metrics: Metrics,
+        interval: float = 60.0,
+        batch_size: int = 50,
+        rate: float = 1.0,
+        max_attempts: int = 20,
+        backoff_max: float = 3600.0,
+        path: Path = LEDGER_PATH
+    ):
+        self._client = client
+        self._ledger = ledger
+        self._metrics = metrics
+        self._interval = interval
+        self._batch_size = batch_size
+        self._bucket = TokenBucket(rate, 1)
+        self._max_attempts = max_attempts
+        self._backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._listeners: Dict[str, List[Listener]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "kind TEXT NOT NULL, "
+            "key TEXT, "
+            "payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL, "
+            "next_at REAL NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "last_error TEXT, "
+            "UNIQUE (kind, key)"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_at)")
+
+        now = time.time()
+        with self._lock:
+            released = self._conn.execute(
+                "UPDATE outbox SET next_at = ? WHERE status = ? AND next_at > ?",
+                (now, PENDING, now)
+            ).rowcount
+        if released:
+            logger.info(f"{released} pending outbox actions will be retried")
+
+    def on_refunded(self, source: str, listener: Listener) -> None:
+        self._listeners.setdefault(source, []).append(listener)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run,
+            name="AutoRefund-Outbox",
+            daemon=True
+        )
+        self._thread.start()
+
+    def _insert(self, entries: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> List[Optional[int]]:
+        now = time.time()
+        entry_ids: List[Optional[int]] = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for kind, key, payload in entries:
+                    self._conn.execute(
+                        "DELETE FROM outbox WHERE kind = ? AND key = ? AND status = ?",
+                        (kind, key, FAILED)
+                    )
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO outbox "
+                        "(kind, key, payload, status, attempts, next_at, created_at) "
+                        "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                        (kind, key, json.dumps(payload, ensure_ascii=False), PENDING, now + self.LEASE, now)
+                    )
+                    entry_ids.append(cursor.lastrowid if cursor.rowcount else None)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return entry_ids
+
+    def _release(self, entry_id: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET next_at = ? WHERE id = ?", (time.time(), entry_id))
+
+    def _done(self, entry_ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+    def _failed(self, entry_id: int, attempts: int, error: BaseException) -> bool:
+        transient = isinstance(error, CircuitOpenError) or FunPayClient.is_retryable(error)
+        status = PENDING if transient and attempts < self._max_attempts else FAILED
+        delay = min(self._backoff_max, self._interval * 2 ** (attempts - 1))
+        last_error = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, time.time() + delay, last_error, entry_id)
+            )
+            if status == FAILED:
+                self._conn.execute(
+                    "UPDATE outbox SET status = ?, last_error = ? "
+                    "WHERE kind = ? AND status = ? AND key = (SELECT key FROM outbox WHERE id = ? AND kind = ?)",
+                    (FAILED, f"refund failed: {last_error}", OutboxKinds.MESSAGE, PENDING, entry_id, OutboxKinds.REFUND)
+                )
+        if status == FAILED:
+            self._metrics.inc("outbox_failed")
+            logger.error(f"Outbox action {entry_id} failed permanently after {attempts} attempts: {error}")
+        return status == PENDING
+
+    def _execute(self, kind: str, payload: Dict[str, Any], verify: bool) -> None:
+        if kind == OutboxKinds.REFUND:
+            order_id = payload["order_id"]
+            if verify and self._client.get_order(order_id).status == OrderStatuses.REFUNDED:
+                logger.info(f"Order {order_id} was refunded by an earlier attempt")
+            else:
+                self._client.refund(order_id)
+            self._ledger.record(order_id, LedgerActions.REFUNDED, payload.get("buyer"))
+        elif kind == OutboxKinds.MESSAGE:
+            self._client.send_message(payload["chat_id"], payload["text"])
+        else:
+            raise ValueError(f"unknown outbox action {kind}")
+
+    def _attempt(self, entry_id: int, kind: str, key: Optional[str], payload: Dict[str, Any]) -> bool:
+        try:
+            self._execute(kind, payload, False)
+        except Exception as e:
+            if not self._failed(entry_id, 1, e):
+                raise
+            self._metrics.error(e)
+            self._metrics.inc("outbox_deferred")
+            logger.warning(f"{kind} for {key} deferred to outbox: {e}")
+            return False
+
+        self._done([entry_id])
+        return True
+
+    def _submit(
+        self,
+        kind: str,
+        key: Optional[str],
+        payload: Dict[str, Any],
+        follow_up: Optional[Dict[str, Any]] = None
+    ) -> str:
+        entries = [(kind, key, payload)]
+        if follow_up is not None:
+            entries.append((OutboxKinds.MESSAGE, key, follow_up))
+
+        try:
+            entry_ids = self._insert(entries)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record {kind} in outbox, running it directly: {e}")
+            for entry_kind, _, entry_payload in entries:
+                self._execute(entry_kind, entry_payload, False)
+            return OutboxResults.DONE
+
+        entry_id = entry_ids[0]
+        if entry_id is None:
+            logger.debug(f"Outbox {kind} for {key} is already pending")
+            return OutboxResults.DUPLICATE
+
+        follow_up_id = entry_ids[1] if follow_up is not None else None
+        if not self._attempt(entry_id, kind, key, payload):
+            if follow_up_id is not None:
+                self._release(follow_up_id)
+            return OutboxResults.QUEUED
+
+        if follow_up_id is not None:
+            try:
+                self._attempt(follow_up_id, OutboxKinds.MESSAGE, key, follow_up)
+            except Exception as e:
+                self._metrics.error(e)
+                logger.error(f"Failed to send message for {key}: {e}")
+        return OutboxResults.DONE
+
+    def refund(
+        self,
+        order_id: str,
+        buyer_username: Optional[str] = None,
+        message: Optional[Tuple[Any, str]] = None,
+        **details: Any
+    ) -> str:
+        follow_up = None
+        if message is not None:
+            chat_id, text = message
+            follow_up = {"chat_id": chat_id, "text": text}
+        payload = {"order_id": order_id, "buyer": buyer_username, **details}
+        return self._submit(OutboxKinds.REFUND, order_id, payload, follow_up)
+
+    def send_message(self, chat_id: Any, text: str, key: Optional[str] = None) -> str:
+        return self._submit(OutboxKinds.MESSAGE, key, {"chat_id": chat_id, "text": text})
+
+    def _due(self) -> List[Entry]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload, attempts FROM outbox AS o "
+                "WHERE status = ? AND next_at <= ? AND NOT (kind = ? AND EXISTS ("
+                "SELECT 1 FROM outbox AS r WHERE r.kind = ? AND r.key = o.key AND r.status = ?"
+                ")) ORDER BY id LIMIT ?",
+                (PENDING, time.time(), OutboxKinds.MESSAGE, OutboxKinds.REFUND, PENDING, self._batch_size)
+            ).fetchall()
+        return [(entry_id, kind, json.loads(payload), attempts) for entry_id, kind, payload, attempts in rows]
+
+    def _notify(self, refunded: List[Dict[str, Any]]) -> None:
+        for payload in refunded:
+            for listener in self._listeners.get(payload.get("source"), ()):
+                try:
+                    listener(payload)
+                except Exception as e:
+                    logger.error(f"Outbox listener failed for order {payload.get('order_id')}: {e}")
+
+    def drain(self) -> int:
+        done: List[int] = []
+        refunded: List[Dict[str, Any]] = []
+        try:
+            for entry_id, kind, payload, attempts in self._due():
+                if self._stop.is_set():
+                    break
+                self._bucket.acquire()
+                try:
+                    self._execute(kind, payload, True)
+                except CircuitOpenError as e:
+                    logger.debug(f"Outbox paused: {e}")
+                    break
+                except Exception as e:
+                    self._metrics.error(e)
+                    self._failed(entry_id, attempts + 1, e)
+                    continue
+                done.append(entry_id)
+                if kind == OutboxKinds.REFUND:
+                    refunded.append(payload)
+        finally:
+            if done:
+                self._done(done)
+                self._metrics.inc("outbox_drained", len(done))
+                logger.info(f"Outbox delivered {len(done)} pending actions")
+        if refunded:
+            self._wakeup.set()
+            self._notify(refunded)
+        return len(done)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                drained = self.drain()
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+                drained = 0
+
+            if drained < self._batch_size:
+                self._wakeup.wait(self._interval)
+                self._wakeup.clear()
+
+    def pending(self) -> int:
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (PENDING,)).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        with self._lock:
+            self._conn.close()
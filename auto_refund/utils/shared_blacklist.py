@@ -0,0 +1,175 @@
+from __future__ import annotations
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("FPC.AutoRefund.SharedBlacklist")
+
+Change = Tuple[str, str]
+
+
+class SharedBlacklist:
+    POLL_BATCH = 1000
+    BUSY_TIMEOUT = 10.0
+    CHANGE_RETENTION = 7 * 86400.0
+    PRUNE_INTERVAL = 3600.0
+
+    def __init__(self, path: Path, poll_interval: float = 2.0):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._pending: List[Change] = []
+        self._conn: Optional[sqlite3.Connection] = None
+        self._seq: Optional[int] = None
+        self._last_prune = 0.0
+        self._on_bootstrap: Optional[Callable[[Dict[str, bool]], None]] = None
+        self._on_changes: Optional[Callable[[List[Change]], None]] = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(
+        self,
+        on_bootstrap: Callable[[Dict[str, bool]], None],
+        on_changes: Callable[[List[Change]], None]
+    ) -> None:
+        self._on_bootstrap = on_bootstrap
+        self._on_changes = on_changes
+        self._thread = threading.Thread(
+            target=self._run,
+            name="AutoRefund-SharedBlacklist",
+            daemon=True
+        )
+        self._thread.start()
+
+    def publish(self, op: str, username: str) -> None:
+        with self._lock:
+            self._pending.append((op, username))
+        self._wakeup.set()
+
+    def publish_many(self, op: str, usernames: Iterable[str]) -> None:
+        with self._lock:
+            self._pending.extend((op, username) for username in usernames)
+        self._wakeup.set()
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self._path), timeout=self.BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS members ("
+            "username TEXT PRIMARY KEY, "
+            "active INTEGER NOT NULL, "
+            "seq INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "op TEXT NOT NULL, "
+            "username TEXT NOT NULL, "
+            "created_at REAL NOT NULL"
+            ")"
+        )
+        return conn
+
+    def _bootstrap(self, conn: sqlite3.Connection) -> None:
+        conn.execute("BEGIN")
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            members = {name: bool(active) for name, active in conn.execute("SELECT username, active FROM members")}
+        finally:
+            conn.execute("COMMIT")
+
+        self._on_bootstrap(members)
+        self._seq = seq
+        logger.info(f"Shared blacklist attached ({sum(members.values())} users, seq {seq})")
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                for op, username in batch:
+                    active = op == "+"
+                    row = conn.execute("SELECT active FROM members WHERE username = ?", (username,)).fetchone()
+                    if row is not None and bool(row[0]) == active:
+                        continue
+                    seq = conn.execute(
+                        "INSERT INTO changes (op, username, created_at) VALUES (?, ?, ?)",
+                        (op, username, now)
+                    ).lastrowid
+                    conn.execute(
+                        "INSERT OR REPLACE INTO members VALUES (?, ?, ?)",
+                        (username, int(active), seq)
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception:
+            with self._lock:
+                self._pending[:0] = batch
+            raise
+
+    def _poll(self, conn: sqlite3.Connection) -> None:
+        while True:
+            rows = conn.execute(
+                "SELECT seq, op, username FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self._seq, self.POLL_BATCH)
+            ).fetchall()
+            if not rows:
+                return
+
+            self._on_changes([(op, username) for _, op, username in rows])
+            self._seq = rows[-1][0]
+            if len(rows) < self.POLL_BATCH:
+                return
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        conn.execute("DELETE FROM changes WHERE created_at < ?", (now - self.CHANGE_RETENTION,))
+
+    def _sync(self) -> None:
+        if self._conn is None:
+            self._conn = self._connect()
+        if self._seq is None:
+            self._bootstrap(self._conn)
+        self._flush(self._conn)
+        self._poll(self._conn)
+        self._prune(self._conn)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._sync()
+            except Exception as e:
+                logger.error(f"Shared blacklist sync failed: {e}")
+
+            if self._stop.is_set():
+                break
+            self._wakeup.wait(self._poll_interval)
+            self._wakeup.clear()
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.BUSY_TIMEOUT + 5)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+from typing import Collection, Iterable, List, Tuple
+from bisect import bisect_left, insort
+
+SEPARATOR = "\x00"
+PREFIX_END = "\U0010ffff"
+
+
+def _key(name: str) -> str:
+    return f"{name.casefold()}{SEPARATOR}{name}"
+
+
+def _name(key: str) -> str:
+    return key.split(SEPARATOR, 1)[1]
+
+
+class SortedNames:
+    BULK_THRESHOLD = 64
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._keys: List[str] = []
+        self.rebuild(names)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rebuild(self, names: Iterable[str]) -> None:
+        self._keys = sorted(_key(name) for name in names)
+
+    def add(self, name: str) -> None:
+        insort(self._keys, _key(name))
+
+    def discard(self, name: str) -> None:
+        key = _key(name)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def update(self, names: Collection[str]) -> None:
+        if len(names) <= self.BULK_THRESHOLD:
+            for name in names:
+                self.add(name)
+            return
+        self._keys.extend(_key(name) for name in names)
+        self._keys.sort()
+
+    def difference_update(self, names: Collection[str]) -> None:
+        if len(names) <= self.BULK_THRESHOLD:
+            for name in names:
+                self.discard(name)
+            return
+        keys = {_key(name) for name in names}
+        self._keys = [key for key in self._keys if key not in keys]
+
+    def page(self, prefix: str, offset: int, limit: int) -> Tuple[int, List[str]]:
+        folded = prefix.casefold()
+        lo = bisect_left(self._keys, folded) if folded else 0
+        hi = bisect_left(self._keys, folded + PREFIX_END, lo) if folded else len(self._keys)
+        start = min(lo + max(0, offset), hi)
+        return hi - lo, [_name(key) for key in self._keys[start:min(start + limit, hi)]]
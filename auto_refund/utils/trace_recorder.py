@@ -0,0 +1,124 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import gzip
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("FPC.AutoRefund.Trace")
+
+KIND_MESSAGE = "message"
+KIND_ORDER = "order"
+KIND_CALL = "call"
+KIND_META = "meta"
+
+
+def _enum_name(value: Any) -> Any:
+    return getattr(value, "name", value)
+
+
+def dump_order(order: Any) -> Optional[Dict[str, Any]]:
+    if order is None:
+        return None
+
+    review = getattr(order, "review", None)
+    subcategory = getattr(order, "subcategory", None)
+    category = getattr(subcategory, "category", None)
+    return {
+        "id": str(order.id),
+        "buyer_username": order.buyer_username,
+        "sum": order.sum,
+        "status": _enum_name(getattr(order, "status", None)),
+        "chat_id": getattr(order, "chat_id", None),
+        "stars": getattr(review, "stars", None) if review else None,
+        "review": review is not None and bool(review),
+        "subcategory": getattr(subcategory, "id", None),
+        "category": getattr(category, "id", None),
+        "currency": _enum_name(getattr(order, "currency", None)),
+    }
+
+
+def dump_message(message: Any) -> Dict[str, Any]:
+    return {
+        "type": _enum_name(message.type),
+        "text": str(message),
+        "chat_id": message.chat_id,
+        "chat_name": getattr(message, "chat_name", None),
+        "author_id": message.author_id,
+    }
+
+
+def dump_args(args: List[Any]) -> List[Any]:
+    return [arg if arg is None or isinstance(arg, (str, int, float)) else str(arg) for arg in args]
+
+
+def dump_result(method: str, result: Any) -> Any:
+    if method == "get_order":
+        return dump_order(result)
+    if method == "get_chat_by_name":
+        return {"id": result.id, "name": getattr(result, "name", None)} if result else None
+    if method == "get_sales":
+        next_id, orders = result[0], result[1]
+        return [next_id, [dump_order(order) for order in orders]]
+    return None
+
+
+class TraceRecorder:
+    def __init__(self, path: Path, account_id: Any, blacklist: List[str], settings: Dict[str, Any]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8", compresslevel=6)
+        self._started = time.monotonic()
+        self.records = 0
+        self._write({
+            "k": KIND_META,
+            "account_id": account_id,
+            "started_at": time.time(),
+            "settings": settings,
+            "blacklist": blacklist,
+        })
+        logger.info(f"Recording events to {path}")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        record["t"] = round(time.monotonic() - self._started, 6)
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.records += 1
+
+    def message(self, event: Any) -> None:
+        try:
+            self._write({"k": KIND_MESSAGE, "e": dump_message(event.message)})
+        except Exception as e:
+            logger.debug(f"Failed to record message: {e}")
+
+    def order(self, event: Any) -> None:
+        try:
+            self._write({"k": KIND_ORDER, "e": dump_order(event.order)})
+        except Exception as e:
+            logger.debug(f"Failed to record order: {e}")
+
+    def call(self, method: str, args: List[Any], result: Any = None, error: Optional[BaseException] = None) -> None:
+        try:
+            record: Dict[str, Any] = {"k": KIND_CALL, "m": method, "a": dump_args(args)}
+            if error is not None:
+                record["x"] = type(error).__name__
+                record["s"] = getattr(error, "status_code", None)
+                record["os"] = isinstance(error, OSError)
+            else:
+                record["r"] = dump_result(method, result)
+            self._write(record)
+        except Exception as e:
+            logger.debug(f"Failed to record {method} call: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logger.info(f"Trace {self._path} closed ({self.records} records)")
@@ -1,16 +1,19 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
+from contextlib import ExitStack
+from pathlib import Path
+import atexit
 import logging
+import threading
 
 if TYPE_CHECKING:
     from cardinal import Cardinal
+    from FunPayAPI.updater.events import NewMessageEvent, NewOrderEvent
+    from plugins.auto_refund.core.dispatcher import EventDispatcher
+    from plugins.auto_refund.core.debouncer import FeedbackDebouncer
+    from plugins.auto_refund.ui.telegram_handler import TelegramUIHandler
+    from plugins.auto_refund.utils.trace_recorder import TraceRecorder
 
-from FunPayAPI.updater.events import NewMessageEvent, NewOrderEvent
-
-from plugins.auto_refund.core.config import RefundConfig
-from plugins.auto_refund.core.refund_processor import RefundProcessor
-from plugins.auto_refund.core.order_handler import OrderHandler
-from plugins.auto_refund.ui.telegram_handler import TelegramUIHandler
 from plugins.auto_refund.utils.constants import PluginMetadata
 
 logger = logging.getLogger("FPC.AutoRefund")
@@ -26,44 +29,298 @@ SETTINGS_PAGE = True
 class AutoRefundPlugin:
     def __init__(self, cardinal: Cardinal):
         self._cardinal = cardinal
-        self._config = RefundConfig.load()
-        self._refund_processor = RefundProcessor(cardinal, self._config)
-        self._order_handler = OrderHandler(cardinal, self._config)
+        self._lock = threading.Lock()
+        self._ready = False
+        self._closed = False
         self._telegram_handler: Optional[TelegramUIHandler] = None
-        
+        self._dispatcher: Optional[EventDispatcher] = None
+        self._debouncer: Optional[FeedbackDebouncer] = None
+        self._recorder: Optional[TraceRecorder] = None
+
+    def start_background(self) -> None:
+        threading.Thread(target=self._ensure_started, name="AutoRefund-Init", daemon=True).start()
+
+    def _ensure_started(self) -> bool:
+        if self._ready:
+            return True
+        with self._lock:
+            if self._closed:
+                return False
+            if self._ready:
+                return True
+            try:
+                self._build()
+            except Exception as e:
+                self._closed = True
+                logger.error(f"Failed to initialize AutoRefund: {e}", exc_info=True)
+                return False
+            self._ready = True
+            return True
+
+    def _build(self) -> None:
+        from plugins.auto_refund.core.config import RefundConfig
+        from plugins.auto_refund.core.refund_processor import RefundProcessor
+        from plugins.auto_refund.core.order_handler import OrderHandler
+        from plugins.auto_refund.core.dispatcher import EventDispatcher
+        from plugins.auto_refund.core.reconciler import Reconciler
+        from plugins.auto_refund.core.debouncer import FeedbackDebouncer
+        from plugins.auto_refund.utils.ban_scheduler import BanScheduler
+        from plugins.auto_refund.utils.blacklist_manager import BlacklistManager
+        from plugins.auto_refund.utils.shared_blacklist import SharedBlacklist
+        from plugins.auto_refund.utils.ledger import RefundLedger
+        from plugins.auto_refund.utils.outbox import Outbox
+        from plugins.auto_refund.utils.audit_log import AuditLog
+        from plugins.auto_refund.utils.chat_cache import ChatCache
+        from plugins.auto_refund.utils.order_index import OrderIndex
+        from plugins.auto_refund.utils.analytics import RefundAnalytics
+        from plugins.auto_refund.utils.notification_sender import NotificationSender
+        from plugins.auto_refund.utils.metrics import Metrics, MetricsExporter
+        from plugins.auto_refund.utils.funpay_client import FunPayClient
+        from plugins.auto_refund.utils.trace_recorder import TraceRecorder
+
+        cardinal = self._cardinal
+        with ExitStack() as stack:
+            self._config = RefundConfig.load()
+            stack.callback(self._config.close)
+            settings = self._config.snapshot
+            self._metrics = Metrics()
+            shared_blacklist = None
+            if settings.shared_blacklist_path:
+                shared_blacklist = SharedBlacklist(Path(settings.shared_blacklist_path), settings.shared_blacklist_poll)
+            self._blacklist_manager = BlacklistManager(cardinal, shared=shared_blacklist, scheduler=BanScheduler())
+            stack.callback(self._blacklist_manager.close)
+            if settings.trace_path:
+                self._recorder = TraceRecorder(
+                    Path(settings.trace_path),
+                    getattr(cardinal.account, "id", None),
+                    list(cardinal.blacklist),
+                    settings.to_dict()
+                )
+                stack.callback(self._recorder.close)
+            self._client = FunPayClient(
+                cardinal.account,
+                self._metrics,
+                rate=settings.api_rate,
+                burst=settings.api_burst,
+                retries=settings.api_retries,
+                backoff_base=settings.api_backoff_base,
+                backoff_max=settings.api_backoff_max,
+                breaker_threshold=settings.api_breaker_threshold,
+                breaker_cooldown=settings.api_breaker_cooldown,
+                recorder=self._recorder
+            )
+            self._ledger = RefundLedger()
+            stack.callback(self._ledger.close)
+            self._outbox = Outbox(
+                self._client,
+                self._ledger,
+                self._metrics,
+                interval=settings.outbox_interval,
+                batch_size=settings.outbox_batch_size,
+                rate=settings.outbox_rate,
+                max_attempts=settings.outbox_max_attempts
+            )
+            stack.callback(self._outbox.close)
+            self._audit_log = AuditLog(self._metrics, settings.audit_max_segments)
+            stack.callback(self._audit_log.close)
+            self._chat_cache = ChatCache(settings.chat_cache_size, settings.chat_cache_ttl)
+            self._order_index = OrderIndex(settings.order_index_size)
+            self._notification_sender = NotificationSender(cardinal, self._config, self._metrics)
+            stack.callback(self._notification_sender.close)
+            self._analytics = RefundAnalytics(
+                settings.analytics_capacity,
+                settings.analytics_spike_factor,
+                settings.analytics_spike_min,
+                on_spike=self._notification_sender.send_alert
+            )
+            self._refund_processor = RefundProcessor(
+                cardinal, self._client, self._config, self._blacklist_manager, self._ledger,
+                self._chat_cache, self._notification_sender, self._metrics, self._audit_log, self._order_index,
+                self._outbox, self._analytics
+            )
+            self._order_handler = OrderHandler(
+                cardinal, self._client, self._config, self._blacklist_manager, self._ledger,
+                self._chat_cache, self._notification_sender, self._metrics, self._audit_log, self._outbox,
+                self._analytics
+            )
+            self._reconciler = Reconciler(
+                self._client, self._config, self._ledger,
+                self._refund_processor, self._order_handler, self._metrics
+            )
+            stack.callback(self._reconciler.stop)
+
+            if settings.async_processing:
+                self._dispatcher = EventDispatcher(
+                    workers=settings.worker_count,
+                    queue_size=settings.queue_size,
+                    put_timeout=settings.queue_timeout
+                )
+                stack.callback(self._dispatcher.shutdown)
+            if settings.feedback_debounce > 0:
+                self._debouncer = FeedbackDebouncer(settings.feedback_debounce, self._submit_feedback, self._metrics)
+                stack.callback(self._debouncer.close)
+
+            self._outbox.start()
+            self._register_gauges()
+            self._metrics_exporter = MetricsExporter(self._metrics, settings.metrics_export_interval)
+            stack.callback(self._metrics_exporter.close)
+
+            if settings.reconcile_on_startup:
+                self._reconciler.start()
+            stack.pop_all()
+
         logger.info("AutoRefund plugin initialized")
 
+    def _register_gauges(self) -> None:
+        self._metrics.register_gauge("blacklist_size", lambda: len(self._cardinal.blacklist))
+        self._metrics.register_gauge("blacklist_expiring", self._blacklist_manager.expiring)
+        self._metrics.register_gauge("chat_cache_hits", lambda: self._chat_cache.hits)
+        self._metrics.register_gauge("chat_cache_misses", lambda: self._chat_cache.misses)
+        self._metrics.register_gauge("order_index_size", lambda: len(self._order_index))
+        self._metrics.register_gauge("notifications_pending", self._notification_sender.pending)
+        self._metrics.register_gauge("audit_pending", self._audit_log.pending)
+        self._metrics.register_gauge("outbox_pending", self._outbox.pending)
+        self._metrics.register_gauge(
+            "api_circuit_open",
+            lambda: self._client.breaker.state != self._client.breaker.CLOSED
+        )
+        if self._dispatcher:
+            self._metrics.register_gauge("queue_depth", self._dispatcher.pending)
+            self._metrics.register_gauge("queue_overflowed", lambda: self._dispatcher.overflowed)
+        if self._debouncer:
+            self._metrics.register_gauge("feedback_debounce_pending", self._debouncer.pending)
+
+    def register_commands(self) -> None:
+        if self._cardinal.telegram:
+            self._cardinal.add_telegram_commands(UUID, [
+                ("ar_stats", "статистика автовозврата", True),
+                ("ar_history", "история решений по пользователю или #заказу", True),
+            ])
+
     def initialize_telegram(self) -> None:
         if self._cardinal.telegram:
+            from plugins.auto_refund.ui.telegram_handler import TelegramUIHandler
+
             self._telegram_handler = TelegramUIHandler(
                 bot=self._cardinal.telegram.bot,
                 tg=self._cardinal.telegram,
-                config=self._config,
-                uuid=UUID
+                uuid=UUID,
+                start=self._attach_telegram
             )
             self._telegram_handler.register_handlers()
             logger.info("Telegram handlers registered")
 
+    def _attach_telegram(self) -> bool:
+        if not self._ensure_started():
+            return False
+        self._telegram_handler.attach(
+            config=self._config,
+            metrics=self._metrics,
+            reconciler=self._reconciler,
+            audit_log=self._audit_log,
+            blacklist_manager=self._blacklist_manager,
+            analytics=self._analytics
+        )
+        return True
+
     def handle_message(self, event: NewMessageEvent) -> None:
         try:
-            self._refund_processor.process_feedback(event)
+            if not self._ensure_started():
+                return
+            self._metrics.inc("events_seen")
+            if self._recorder:
+                self._recorder.message(event)
+            order_id = self._refund_processor.classify(event)
+            if order_id is None:
+                self._metrics.inc("events_filtered")
+                return
+
+            if self._debouncer:
+                self._debouncer.push(order_id, event)
+            else:
+                self._submit_feedback(order_id, event)
         except Exception as e:
             logger.error(f"Error processing feedback: {e}", exc_info=True)
 
+    def _submit_feedback(self, order_id: str, event: NewMessageEvent) -> None:
+        if self._dispatcher:
+            self._dispatcher.submit(event.message.chat_name or order_id, self._refund_processor.handle, event, order_id)
+        else:
+            self._refund_processor.handle(event, order_id)
+
     def handle_order(self, event: NewOrderEvent) -> None:
         try:
-            self._order_handler.process_order(event)
+            if not self._ensure_started():
+                return
+            self._metrics.inc("orders_seen")
+            if self._recorder:
+                self._recorder.order(event)
+            self._order_index.put(event.order)
+            if not self._order_handler.accepts(event):
+                self._metrics.inc("orders_filtered")
+                return
+
+            if self._dispatcher:
+                self._dispatcher.submit(event.order.buyer_username, self._order_handler.handle, event)
+            else:
+                self._order_handler.handle(event)
         except Exception as e:
             logger.error(f"Error processing order: {e}", exc_info=True)
 
+    def wait_idle(self) -> None:
+        if self._debouncer:
+            self._debouncer.join()
+        if self._dispatcher:
+            self._dispatcher.join()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            if not self._ready:
+                return
+            self._ready = False
+
+        self._reconciler.stop()
+        if self._debouncer:
+            self._debouncer.close()
+        if self._dispatcher:
+            self._dispatcher.shutdown()
+        self._outbox.close()
+        self._notification_sender.close()
+        self._metrics_exporter.close()
+        self._blacklist_manager.close()
+        self._ledger.close()
+        self._audit_log.close()
+        self._config.close()
+        if self._recorder:
+            self._recorder.close()
+        logger.info("AutoRefund plugin stopped")
+
 
 _plugin_instance: Optional[AutoRefundPlugin] = None
+_atexit_registered = False
 
 
 def init(cardinal: Cardinal) -> None:
-    global _plugin_instance
+    global _plugin_instance, _atexit_registered
     _plugin_instance = AutoRefundPlugin(cardinal)
-    _plugin_instance.initialize_telegram()
+    _plugin_instance.register_commands()
+    _plugin_instance.start_background()
+    if not _atexit_registered:
+        atexit.register(shutdown)
+        _atexit_registered = True
+
+
+def post_init(cardinal: Cardinal) -> None:
+    if _plugin_instance:
+        _plugin_instance.initialize_telegram()
+
+
+def shutdown(*args: Any) -> None:
+    global _plugin_instance
+    instance, _plugin_instance = _plugin_instance, None
+    if instance:
+        instance.shutdown()
 
 
 def message_hook(cardinal: Cardinal, event: NewMessageEvent) -> None:
@@ -77,6 +334,7 @@ def order_hook(cardinal: Cardinal, event: NewOrderEvent) -> None:
 
 
 BIND_TO_PRE_INIT = [init]
+BIND_TO_POST_INIT = [post_init]
 BIND_TO_NEW_MESSAGE = [message_hook]
 BIND_TO_NEW_ORDER = [order_hook]
-BIND_TO_DELETE = None
\ No newline at end of file
+BIND_TO_DELETE = shutdown
\ No newline at end of file
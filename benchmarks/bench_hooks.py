@@ -0,0 +1,231 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+from pathlib import Path
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import stubs
+
+MESSAGE_SHARE = 0.8
+BLACKLISTED_ORDER_SHARE = 0.1
+MESSAGE_MIX = (
+    (stubs.MessageTypes.NON_SYSTEM, 0.5),
+    (stubs.MessageTypes.NEW_FEEDBACK, 0.25),
+    (stubs.MessageTypes.FEEDBACK_CHANGED, 0.15),
+    (stubs.MessageTypes.FEEDBACK_DELETED, 0.1),
+)
+
+
+def build_stream(
+    account: stubs.Account,
+    events: int,
+    blacklist: List[str],
+    seed: int,
+    feed_orders: bool = False
+) -> List[Tuple[str, Any]]:
+    rng = random.Random(seed)
+    types_, weights = zip(*MESSAGE_MIX)
+    pool_size = max(1, events // 4)
+    order_ids = [f"{i:08X}" for i in range(pool_size)]
+
+    for i, order_id in enumerate(order_ids):
+        buyer = f"buyer_{i}"
+        account.chats[buyer] = 100000 + i
+        account.orders[order_id] = stubs.Order(
+            order_id,
+            buyer,
+            round(rng.uniform(0.1, 2.0), 2),
+            review=stubs.Review(rng.randint(1, 5)),
+            chat_id=100000 + i
+        )
+
+    stream: List[Tuple[str, Any]] = []
+    if feed_orders:
+        stream.extend(("order", stubs.NewOrderEvent(account.orders[order_id])) for order_id in order_ids)
+
+    for i in range(events):
+        if rng.random() < MESSAGE_SHARE:
+            message_type = rng.choices(types_, weights)[0]
+            index = rng.randrange(pool_size)
+            order = account.orders[order_ids[index]]
+            text = f"Покупатель {order.buyer_username} написал отзыв к заказу #{order.id}."
+            if message_type == stubs.MessageTypes.NON_SYSTEM:
+                text = "Здравствуйте, когда будет выдача?"
+            message = stubs.Message(message_type, text, order.chat_id, order.buyer_username, author_id=0)
+            stream.append(("message", stubs.NewMessageEvent(message)))
+        else:
+            order_id = f"N{i:07X}"
+            if blacklist and rng.random() < BLACKLISTED_ORDER_SHARE:
+                buyer = rng.choice(blacklist)
+            else:
+                buyer = f"buyer_{rng.randrange(pool_size)}"
+            account.chats.setdefault(buyer, 500000 + i)
+            order = stubs.Order(order_id, buyer, round(rng.uniform(0.1, 2.0), 2), status=stubs.OrderStatuses.PAID)
+            account.orders[order_id] = order
+            stream.append(("order", stubs.NewOrderEvent(order)))
+
+    return stream
+
+
+def percentiles(samples: List[int]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50_us": 0.0, "p99_us": 0.0, "max_us": 0.0}
+    samples.sort()
+    last = len(samples) - 1
+    return {
+        "count": len(samples),
+        "p50_us": samples[last // 2] / 1000,
+        "p99_us": samples[int(last * 0.99)] / 1000,
+        "max_us": samples[last] / 1000,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=stubs.REPO_ROOT,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stubs.install()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="auto_refund_bench_") as workdir:
+        os.chdir(workdir)
+        try:
+            return measure(args)
+        finally:
+            os.chdir(cwd)
+
+
+def measure(args: argparse.Namespace) -> Dict[str, Any]:
+    config_path = Path("storage/plugins/auto_refund.json")
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config_path.write_text(json.dumps({
+        "star_1": True,
+        "star_2": True,
+        "feedback_delete": True,
+        "refund_notification": True,
+        "refund_notification_chat_id": 1,
+        "async_processing": not args.sync,
+        "worker_count": args.workers,
+        "queue_size": args.events,
+        "api_rate": args.api_rate,
+        "feedback_debounce": args.debounce,
+    }), encoding="utf-8")
+
+    blacklist = [f"banned_{i}" for i in range(args.blacklist)]
+    account = stubs.Account(latency=args.latency)
+    bot = stubs.TeleBot(latency=args.tg_latency)
+    cardinal = stubs.Cardinal(account, stubs.TgBot(bot), list(blacklist))
+    stream = build_stream(account, args.events, blacklist, args.seed, args.feed_orders)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    plugin = importlib.import_module("plugins.auto_refund_plugin")
+    plugin.init(cardinal)
+    instance = plugin._plugin_instance
+
+    latencies: Dict[str, List[int]] = {"message": [], "order": []}
+    hooks = {"message": plugin.message_hook, "order": plugin.order_hook}
+    clock = time.perf_counter_ns
+
+    gc.collect()
+    started = time.perf_counter()
+    for kind, event in stream:
+        hook = hooks[kind]
+        t0 = clock()
+        hook(cardinal, event)
+        latencies[kind].append(clock() - t0)
+    enqueued = time.perf_counter() - started
+    instance.wait_idle()
+    elapsed = time.perf_counter() - started
+
+    if args.trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    else:
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    plugin.shutdown()
+
+    network_calls = dict(account.calls)
+    total_calls = sum(network_calls.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {
+            "events": args.events,
+            "blacklist": args.blacklist,
+            "latency": args.latency,
+            "tg_latency": args.tg_latency,
+            "workers": args.workers,
+            "api_rate": args.api_rate,
+            "debounce": args.debounce,
+            "sync": args.sync,
+            "feed_orders": args.feed_orders,
+            "seed": args.seed,
+        },
+        "results": {
+            "events_per_sec": len(stream) / elapsed if elapsed else 0.0,
+            "hook_events_per_sec": len(stream) / enqueued if enqueued else 0.0,
+            "elapsed_s": elapsed,
+            "message_hook": percentiles(latencies["message"]),
+            "order_hook": percentiles(latencies["order"]),
+            "network_calls": network_calls,
+            "network_calls_per_event": total_calls / len(stream) if stream else 0.0,
+            "telegram_messages": bot.sent,
+            "peak_memory_mb": peak_memory,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auto Refund hook throughput benchmark")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--blacklist", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated FunPay call latency, s")
+    parser.add_argument("--tg-latency", type=float, default=0.0, help="simulated Telegram call latency, s")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--api-rate", type=float, default=0.0, help="client-side FunPay rate limit, 0 = off")
+    parser.add_argument("--debounce", type=float, default=0.0, help="feedback coalescing window, s, 0 = off")
+    parser.add_argument("--sync", action="store_true", help="process events inline in the hooks")
+    parser.add_argument(
+        "--feed-orders",
+        action="store_true",
+        help="emit a NewOrderEvent for every reviewed order before its feedback"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-memory", action="store_true", help="measure peak memory with tracemalloc")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+from pathlib import Path
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import stubs
+from benchmarks.bench_hooks import git_commit
+
+CATEGORY_SIZE = 20
+
+
+def build_rules(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    rules: List[Dict[str, Any]] = []
+    for i in range(count):
+        rule: Dict[str, Any] = {"max_price": round(rng.uniform(0.5, 50.0), 2), "stars": [1, 2]}
+        if i % 10 == 9:
+            rule["category"] = i // CATEGORY_SIZE
+        else:
+            rule["subcategory"] = i
+        if i % 4 == 3:
+            rule["currency"] = rng.choice(list(stubs.Currency)).name
+        rules.append(rule)
+    return rules
+
+
+def build_orders(count: int, subcategories: int, rng: random.Random) -> List[stubs.Order]:
+    categories: Dict[int, stubs.Category] = {}
+    orders = []
+    for i in range(count):
+        subcategory_id = rng.randrange(subcategories)
+        category_id = subcategory_id // CATEGORY_SIZE
+        category = categories.setdefault(category_id, stubs.Category(category_id))
+        orders.append(stubs.Order(
+            f"{i:08X}",
+            f"buyer_{i}",
+            round(rng.uniform(0.1, 60.0), 2),
+            review=stubs.Review(rng.randint(1, 5)),
+            subcategory=stubs.SubCategory(subcategory_id, category),
+            currency=rng.choice(list(stubs.Currency))
+        ))
+    return orders
+
+
+def measure(count: int, orders: int, rounds: int, seed: int) -> Dict[str, float]:
+    from plugins.auto_refund.core.config import RefundSettings
+
+    rng = random.Random(seed)
+    rules = build_rules(count, rng)
+    started = time.perf_counter()
+    settings = RefundSettings(star_1=True, refund_rules=rules)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    sample = build_orders(orders, max(count, 1) * 2, rng)
+    refunds = 0
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter_ns()
+        for order in sample:
+            rule = settings.rule_for(order)
+            if order.sum <= rule.max_price and rule.should_refund_stars(order.review.stars):
+                refunds += 1
+        best = min(best, time.perf_counter_ns() - started)
+
+    return {
+        "rules": len(settings.rule_table),
+        "compile_ms": compile_ms,
+        "decision_ns": best / len(sample),
+        "refund_share": refunds / (len(sample) * rounds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auto Refund rule table decision cost benchmark")
+    parser.add_argument("--rules", type=int, nargs="+", default=[0, 10, 100, 1000, 10000])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    stubs.install()
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {"orders": args.orders, "rounds": args.rounds, "seed": args.seed},
+        "results": {str(count): measure(count, args.orders, args.rounds, args.seed) for count in args.rules},
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
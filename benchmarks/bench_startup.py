@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import stubs
+from benchmarks.bench_hooks import git_commit
+
+STAGES = ("import_ms", "init_ms", "post_init_ms", "first_event_ms")
+
+
+def measure_once(blacklist: int) -> Dict[str, float]:
+    stubs.install()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="auto_refund_startup_") as workdir:
+        os.chdir(workdir)
+        try:
+            return measure(blacklist)
+        finally:
+            os.chdir(cwd)
+
+
+def measure(blacklist: int) -> Dict[str, float]:
+    config_path = Path("storage/plugins/auto_refund.json")
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config_path.write_text(json.dumps({"feedback_debounce": 0}), encoding="utf-8")
+
+    account = stubs.Account()
+    account.orders["AAAAAAAA"] = stubs.Order("AAAAAAAA", "buyer", 0.5, review=stubs.Review(1), chat_id=1)
+    cardinal = stubs.Cardinal(account, stubs.TgBot(stubs.TeleBot()), [f"banned_{i}" for i in range(blacklist)])
+    message = stubs.Message(stubs.MessageTypes.NEW_FEEDBACK, "Отзыв к заказу #AAAAAAAA", 1, "buyer")
+    clock = time.perf_counter
+
+    t0 = clock()
+    import plugins.auto_refund_plugin as plugin
+    t1 = clock()
+    plugin.init(cardinal)
+    t2 = clock()
+    plugin.post_init(cardinal)
+    t3 = clock()
+    plugin.message_hook(cardinal, stubs.NewMessageEvent(message))
+    plugin._plugin_instance.wait_idle()
+    t4 = clock()
+    plugin.shutdown()
+
+    return {
+        "import_ms": (t1 - t0) * 1000,
+        "init_ms": (t2 - t1) * 1000,
+        "post_init_ms": (t3 - t2) * 1000,
+        "first_event_ms": (t4 - t3) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auto Refund startup cost benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--blacklist", type=int, default=10000)
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.blacklist)))
+        return
+
+    samples: List[Dict[str, float]] = []
+    for _ in range(args.runs):
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--blacklist", str(args.blacklist)],
+            cwd=stubs.REPO_ROOT
+        )
+        samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    results: Dict[str, Any] = {}
+    for stage in STAGES:
+        values = sorted(sample[stage] for sample in samples)
+        results[stage] = {"median": statistics.median(values), "max": values[-1]}
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {"runs": args.runs, "blacklist": args.blacklist},
+        "results": results,
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
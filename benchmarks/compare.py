@@ -0,0 +1,51 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, Tuple
+from pathlib import Path
+import argparse
+import json
+
+HIGHER_IS_BETTER = ("events_per_sec",)
+
+
+def flatten(data: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, float(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", type=Path)
+    parser.add_argument("head", type=Path)
+    args = parser.parse_args()
+
+    base = json.loads(args.base.read_text(encoding="utf-8"))
+    head = json.loads(args.head.read_text(encoding="utf-8"))
+
+    if base.get("params") != head.get("params"):
+        print("warning: benchmark parameters differ")
+
+    base_metrics = dict(flatten(base["results"]))
+    head_metrics = dict(flatten(head["results"]))
+
+    print(f"{'metric':<40} {base.get('commit', 'base'):>14} {head.get('commit', 'head'):>14} {'change':>9}")
+    for name in sorted(base_metrics.keys() | head_metrics.keys()):
+        old = base_metrics.get(name)
+        new = head_metrics.get(name)
+        if old is None or new is None:
+            print(f"{name:<40} {old if old is not None else '-':>14} {new if new is not None else '-':>14}")
+            continue
+
+        change = (new - old) / old * 100 if old else 0.0
+        marker = ""
+        if abs(change) >= 5:
+            better = change > 0 if name.endswith(HIGHER_IS_BETTER) else change < 0
+            marker = " +" if better else " -"
+        print(f"{name:<40} {old:>14.3f} {new:>14.3f} {change:>8.1f}%{marker}")
+
+
+if __name__ == "__main__":
+    main()
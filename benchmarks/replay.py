@@ -0,0 +1,257 @@
+from __future__ import annotations
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from collections import Counter, deque
+from pathlib import Path
+import argparse
+import gc
+import gzip
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import stubs
+from benchmarks.bench_hooks import git_commit, percentiles
+
+
+class ReplayedError(Exception):
+    def __init__(self, name: str, status_code: Optional[int]):
+        super().__init__(f"replayed {name}")
+        self.status_code = status_code
+
+
+class ReplayedOSError(OSError):
+    pass
+
+
+def read_trace(path: Path) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_order(data: Optional[Dict[str, Any]]) -> Optional[stubs.Order]:
+    if data is None:
+        return None
+
+    subcategory = None
+    if data.get("subcategory") is not None:
+        subcategory = stubs.SubCategory(data["subcategory"], stubs.Category(data.get("category")))
+    status = stubs.OrderStatuses.__members__.get(data.get("status") or "", stubs.OrderStatuses.PAID)
+    currency = stubs.Currency.__members__.get(data.get("currency") or "", stubs.Currency.RUB)
+    return stubs.Order(
+        data["id"],
+        data["buyer_username"],
+        data["sum"],
+        status=status,
+        review=stubs.Review(data.get("stars")) if data.get("review") else None,
+        chat_id=data.get("chat_id"),
+        subcategory=subcategory,
+        currency=currency
+    )
+
+
+def load_message(data: Dict[str, Any]) -> stubs.Message:
+    return stubs.Message(
+        stubs.MessageTypes.__members__.get(data["type"], stubs.MessageTypes.NON_SYSTEM),
+        data["text"],
+        data["chat_id"],
+        data.get("chat_name"),
+        author_id=data.get("author_id") or 0
+    )
+
+
+class TraceAccount(stubs.Account):
+    def __init__(self, calls: List[Dict[str, Any]], latency: float = 0.0, account_id: Any = 1):
+        super().__init__(latency=latency, account_id=account_id)
+        self._responses: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        self.recorded: Counter = Counter()
+        self.unmatched: Counter = Counter()
+        self.refunded: List[str] = []
+        for record in calls:
+            key = (record["m"], json.dumps(record["a"]))
+            self._responses.setdefault(key, deque()).append(record)
+            self.recorded[record["m"]] += 1
+
+    def _respond(self, method: str, *args: Any) -> Optional[Dict[str, Any]]:
+        from plugins.auto_refund.utils.trace_recorder import dump_args
+
+        self._call(method)
+        responses = self._responses.get((method, json.dumps(dump_args(list(args)))))
+        if not responses:
+            self.unmatched[method] += 1
+            return None
+
+        record = responses.popleft() if len(responses) > 1 else responses[0]
+        if "x" in record:
+            if record.get("os"):
+                raise ReplayedOSError(record["x"])
+            raise ReplayedError(record["x"], record.get("s"))
+        return record
+
+    def get_order(self, order_id: str) -> stubs.Order:
+        record = self._respond("get_order", order_id)
+        if record is None:
+            raise LookupError(f"order {order_id} is not in the trace")
+        return load_order(record["r"])
+
+    def refund(self, order_id: str) -> None:
+        self._respond("refund", order_id)
+        self.refunded.append(str(order_id))
+
+    def send_message(self, chat_id: int, text: str, *args: Any, **kwargs: Any) -> None:
+        self._respond("send_message", chat_id, text)
+
+    def get_chat_by_name(self, name: str, *args: Any, **kwargs: Any) -> Optional[stubs.Chat]:
+        record = self._respond("get_chat_by_name", name)
+        if record is None or record["r"] is None:
+            return None
+        return stubs.Chat(record["r"]["id"], record["r"]["name"])
+
+    def get_sales(self, start_from: Optional[str] = None, **kwargs: Any) -> Tuple[Optional[str], List[stubs.Order]]:
+        record = self._respond("get_sales", start_from)
+        if record is None:
+            return None, []
+        next_id, orders = record["r"]
+        return next_id, [load_order(order) for order in orders]
+
+
+def replay(
+    args: argparse.Namespace,
+    settings: Dict[str, Any],
+    meta: Dict[str, Any],
+    events: List[Tuple[float, str, Any]],
+    calls: List[Dict[str, Any]]
+) -> Tuple[TraceAccount, Dict[str, List[int]], float]:
+    config_path = Path("storage/plugins/auto_refund.json")
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config_path.write_text(json.dumps(settings), encoding="utf-8")
+
+    account = TraceAccount(calls, latency=args.latency, account_id=meta.get("account_id", 1))
+    bot = stubs.TeleBot()
+    cardinal = stubs.Cardinal(account, stubs.TgBot(bot), list(meta.get("blacklist", [])))
+
+    plugin = importlib.import_module("plugins.auto_refund_plugin")
+    plugin.init(cardinal)
+    instance = plugin._plugin_instance
+
+    latencies: Dict[str, List[int]] = {"message": [], "order": []}
+    hooks = {"message": plugin.message_hook, "order": plugin.order_hook}
+    clock = time.perf_counter_ns
+
+    gc.collect()
+    started = time.perf_counter()
+    first_t = events[0][0] if events else 0.0
+    for t, kind, event in events:
+        if args.speed > 0:
+            delay = (t - first_t) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        t0 = clock()
+        hooks[kind](cardinal, event)
+        latencies[kind].append(clock() - t0)
+    instance.wait_idle()
+    elapsed = time.perf_counter() - started
+    plugin.shutdown()
+    return account, latencies, elapsed
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stubs.install()
+
+    meta: Dict[str, Any] = {}
+    events: List[Tuple[float, str, Any]] = []
+    calls: List[Dict[str, Any]] = []
+    offset = last_t = 0.0
+    for record in read_trace(args.trace):
+        kind = record["k"]
+        if kind == "meta":
+            offset = last_t
+            meta = meta or record
+            continue
+
+        t = offset + record["t"]
+        last_t = max(last_t, t)
+        if kind == "call":
+            calls.append(record)
+        elif kind == "message":
+            events.append((t, kind, stubs.NewMessageEvent(load_message(record["e"]))))
+        elif kind == "order":
+            events.append((t, kind, stubs.NewOrderEvent(load_order(record["e"]))))
+
+    settings: Dict[str, Any] = dict(meta.get("settings", {}))
+    if args.config:
+        settings = json.loads(args.config.read_text(encoding="utf-8"))
+    settings.update({
+        "trace_path": "",
+        "reconcile_on_startup": False,
+        "shared_blacklist_path": "",
+        "api_rate": args.api_rate,
+        "async_processing": False,
+        "feedback_debounce": 0,
+    })
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="auto_refund_replay_") as workdir:
+        os.chdir(workdir)
+        try:
+            account, latencies, elapsed = replay(args, settings, meta, events, calls)
+        finally:
+            os.chdir(cwd)
+
+    recorded_refunds = {str(record["a"][0]) for record in calls if record["m"] == "refund" and "x" not in record}
+    replayed_refunds = set(account.refunded)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {
+            "trace": args.trace.name,
+            "speed": args.speed,
+            "latency": args.latency,
+            "api_rate": args.api_rate,
+            "config": args.config.name if args.config else None,
+        },
+        "results": {
+            "events": len(events),
+            "events_per_sec": len(events) / elapsed if elapsed else 0.0,
+            "elapsed_s": elapsed,
+            "message_hook": percentiles(latencies["message"]),
+            "order_hook": percentiles(latencies["order"]),
+            "recorded_calls": dict(account.recorded),
+            "network_calls": dict(account.calls),
+            "unmatched_calls": dict(account.unmatched),
+            "refunds_recorded": len(recorded_refunds),
+            "refunds_replayed": len(replayed_refunds),
+            "refunds_added": len(replayed_refunds - recorded_refunds),
+            "refunds_missing": len(recorded_refunds - replayed_refunds),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded Auto Refund event trace offline")
+    parser.add_argument("trace", type=Path, help="trace written with trace_path (.jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded pace, 0 = as fast as possible")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated FunPay call latency, s")
+    parser.add_argument("--api-rate", type=float, default=0.0, help="client-side FunPay rate limit, 0 = off")
+    parser.add_argument("--config", type=Path, help="auto_refund.json to replay with instead of the recorded one")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
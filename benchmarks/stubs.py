@@ -0,0 +1,248 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import enum
+import re
+import sys
+import threading
+import time
+import types
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class MessageTypes(enum.Enum):
+    NON_SYSTEM = 0
+    ORDER_PURCHASED = 1
+    ORDER_CONFIRMED = 2
+    NEW_FEEDBACK = 3
+    FEEDBACK_CHANGED = 4
+    FEEDBACK_DELETED = 5
+    REFUND = 6
+
+
+class OrderStatuses(enum.Enum):
+    PAID = 0
+    CLOSED = 1
+    REFUNDED = 2
+
+
+class RegularExpressions:
+    ORDER_ID = re.compile(r"#[A-Z0-9]{8}")
+
+
+class Review:
+    def __init__(self, stars: Optional[int], text: str = ""):
+        self.stars = stars
+        self.text = text
+
+
+class Category:
+    def __init__(self, id: int):
+        self.id = id
+
+
+class SubCategory:
+    def __init__(self, id: int, category: Category):
+        self.id = id
+        self.category = category
+
+
+class Currency(enum.Enum):
+    RUB = 0
+    USD = 1
+    EUR = 2
+
+
+class Order:
+    def __init__(
+        self,
+        id: str,
+        buyer_username: str,
+        sum: float,
+        status: OrderStatuses = OrderStatuses.CLOSED,
+        review: Optional[Review] = None,
+        chat_id: int = 0,
+        subcategory: Optional[SubCategory] = None,
+        currency: Currency = Currency.RUB,
+        date: Optional[datetime] = None
+    ):
+        self.id = id
+        self.buyer_username = buyer_username
+        self.sum = sum
+        self.price = sum
+        self.status = status
+        self.review = review
+        self.chat_id = chat_id
+        self.subcategory = subcategory
+        self.currency = currency
+        self.date = date
+
+
+class Message:
+    def __init__(self, type: MessageTypes, text: str, chat_id: int, chat_name: str, author_id: int = 0):
+        self.type = type
+        self.text = text
+        self.chat_id = chat_id
+        self.chat_name = chat_name
+        self.author_id = author_id
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class Chat:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+
+
+class NewMessageEvent:
+    def __init__(self, message: Message):
+        self.message = message
+
+
+class NewOrderEvent:
+    def __init__(self, order: Order):
+        self.order = order
+
+
+class Account:
+    SALES_PAGE = 100
+
+    def __init__(self, latency: float = 0.0, account_id: int = 1):
+        self.id = account_id
+        self.latency = latency
+        self.orders: Dict[str, Order] = {}
+        self.chats: Dict[str, int] = {}
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_order(self, order_id: str) -> Order:
+        self._call("get_order")
+        return self.orders[order_id]
+
+    def refund(self, order_id: str) -> None:
+        self._call("refund")
+        order = self.orders.get(order_id)
+        if order is not None:
+            order.status = OrderStatuses.REFUNDED
+
+    def send_message(self, chat_id: int, text: str, *args: Any, **kwargs: Any) -> None:
+        self._call("send_message")
+
+    def get_sales(self, start_from: Optional[str] = None, **kwargs: Any) -> Tuple[Optional[str], List[Order]]:
+        self._call("get_sales")
+        ids = sorted(self.orders, reverse=True)
+        start = ids.index(start_from) if start_from in self.orders else 0
+        page = ids[start:start + self.SALES_PAGE]
+        next_id = ids[start + self.SALES_PAGE] if start + self.SALES_PAGE < len(ids) else None
+        return next_id, [self.orders[order_id] for order_id in page]
+
+    def get_chat_by_name(self, name: str, *args: Any, **kwargs: Any) -> Optional[Chat]:
+        self._call("get_chat_by_name")
+        chat_id = self.chats.get(name)
+        return Chat(chat_id, name) if chat_id is not None else None
+
+
+class TeleBot:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+
+    def send_message(self, chat_id: int, text: str, *args: Any, **kwargs: Any) -> None:
+        self.sent += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        return lambda *args, **kwargs: None
+
+
+class TgBot:
+    def __init__(self, bot: TeleBot):
+        self.bot = bot
+        self.cbq_handlers: List[Any] = []
+        self.msg_handlers: List[Any] = []
+
+    def cbq_handler(self, handler: Callable[..., Any], func: Callable[..., bool], **kwargs: Any) -> None:
+        self.cbq_handlers.append((handler, func))
+
+    def msg_handler(self, handler: Callable[..., Any], **kwargs: Any) -> None:
+        self.msg_handlers.append((handler, kwargs))
+
+
+class Cardinal:
+    def __init__(self, account: Account, telegram: Optional[TgBot] = None, blacklist: Optional[List[str]] = None):
+        self.account = account
+        self.telegram = telegram
+        self.blacklist: List[str] = blacklist if blacklist is not None else []
+        self.telegram_commands: Dict[str, List[Any]] = {}
+
+    def add_telegram_commands(self, uuid: str, commands: List[Any]) -> None:
+        self.telegram_commands.setdefault(uuid, []).extend(commands)
+
+
+class _InlineKeyboardButton:
+    def __init__(self, text: str, callback_data: Optional[str] = None, **kwargs: Any):
+        self.text = text
+        self.callback_data = callback_data
+
+
+class _InlineKeyboardMarkup:
+    def __init__(self, row_width: int = 3):
+        self.keyboard: List[List[_InlineKeyboardButton]] = []
+
+    def add(self, *buttons: _InlineKeyboardButton) -> _InlineKeyboardMarkup:
+        self.keyboard.append(list(buttons))
+        return self
+
+    def row(self, *buttons: _InlineKeyboardButton) -> _InlineKeyboardMarkup:
+        return self.add(*buttons)
+
+
+def _module(name: str, **attrs: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def install() -> None:
+    fp_types = _module("FunPayAPI.types", MessageTypes=MessageTypes, OrderStatuses=OrderStatuses)
+    events = _module(
+        "FunPayAPI.updater.events",
+        NewMessageEvent=NewMessageEvent,
+        NewOrderEvent=NewOrderEvent,
+        types=fp_types
+    )
+    utils = _module("FunPayAPI.common.utils", RegularExpressions=RegularExpressions)
+    cardinal_tools = _module("Utils.cardinal_tools", cache_blacklist=lambda blacklist: None)
+    tb_types = _module(
+        "telebot.types",
+        InlineKeyboardMarkup=_InlineKeyboardMarkup,
+        InlineKeyboardButton=_InlineKeyboardButton
+    )
+    cbt = type("CBT", (), {"PLUGIN_SETTINGS": "44", "EDIT_PLUGIN": "43"})
+
+    sys.modules.update({
+        "FunPayAPI": _module("FunPayAPI", types=fp_types, __path__=[]),
+        "FunPayAPI.types": fp_types,
+        "FunPayAPI.updater": _module("FunPayAPI.updater", events=events, __path__=[]),
+        "FunPayAPI.updater.events": events,
+        "FunPayAPI.common": _module("FunPayAPI.common", utils=utils, __path__=[]),
+        "FunPayAPI.common.utils": utils,
+        "Utils": _module("Utils", cardinal_tools=cardinal_tools, __path__=[]),
+        "Utils.cardinal_tools": cardinal_tools,
+        "telebot": _module("telebot", TeleBot=TeleBot, types=tb_types, __path__=[]),
+        "telebot.types": tb_types,
+        "tg_bot": _module("tg_bot", CBT=cbt, TgBot=TgBot),
+        "plugins": _module("plugins", __path__=[str(REPO_ROOT)]),
+    })
@@ -0,0 +1,87 @@
+from __future__ import annotations
+from typing import Any, Dict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import threading
+import time
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.events = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "requests": self.requests,
+                "events": self.events,
+                "events_per_request": self.events / self.requests if self.requests else 0.0,
+            }
+
+
+def make_handler(stats: Stats, delay: float, status: int, verbose: bool):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            with stats.lock:
+                stats.connections += 1
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            events = json.loads(body or b"{}").get("events", [])
+            with stats.lock:
+                stats.requests += 1
+                stats.events += len(events)
+            if verbose:
+                for event in events:
+                    print(json.dumps(event, ensure_ascii=False))
+            if delay:
+                time.sleep(delay)
+
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def serve(port: int, delay: float = 0.0, status: int = 200, verbose: bool = False) -> ThreadingHTTPServer:
+    stats = Stats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stats, delay, status, verbose))
+    server.stats = stats
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="WebhookStub", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local webhook collector for testing notification sinks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--status", type=int, default=200, help="HTTP status to answer with")
+    parser.add_argument("--verbose", action="store_true", help="print every received event")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.delay, args.status, args.verbose)
+    print(f"Listening on http://127.0.0.1:{args.port}/")
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(server.stats.snapshot()))
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(server.stats.snapshot()))
+
+
+if __name__ == "__main__":
+    main()